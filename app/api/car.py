@@ -1,19 +1,37 @@
 import time
 from datetime import datetime
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends, Query, UploadFile, File, status, HTTPException, Response
+from fastapi import APIRouter, Depends, Query, UploadFile, File, Form, status, HTTPException, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.auth.base_config import current_active_user
+from app.auth.base_config import current_active_user, current_superuser
 from app.auth.database import get_async_session, User
-from app.config import current_tz
-from app.crud.car import create_car, get_car, migrate_images_to_s3
+from app.config import current_tz, CAR_BATCH_MAX_ITEMS, INGEST_MODE, MIGRATION_CHUNK_SIZE, MIGRATION_CONCURRENCY, TOP_MAX_SIZE
+from app.crud.car import create_car, create_cars, get_car, migration_progress, start_image_migration
+from app.crud.ingestion import ingestion_queue, accepted_response
 from app.crud.cars import get_cars_by_week, get_cars_by_day, get_cars_by_month
-from app.schemas.car import CarResponse
+from app.schemas.car import CarResponse, CarBatchResponse
+from app.utils.file_utils import discard_upload, spool_upload
+from app.utils.sightings import sighting_index
+from app.utils.buckets import BUCKETS
 
 router = APIRouter()
 
 
+def validate_car_fields(number: str, date: str, time: str) -> Optional[str]:
+    if len(number) != 8:
+        return "Number must be 8 characters and match example"
+
+    if len(date) != 10:
+        return "Date must be 10 characters and format YYYY-MM-DD"
+
+    if len(time) != 8:
+        return "Time must be 8 characters and format HH:MM:SS"
+
+    return None
+
+
 @router.post("/", response_model=CarResponse)
 async def create_car_endpoint(
         number: str = Query(..., description="The number of the car", alias="car-number", example="95A123BB"),
@@ -38,24 +56,87 @@ async def create_car_endpoint(
         if not image:
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Image is required")
 
-        if len(number) != 8:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Number must be 8 characters and match example")
+        error = validate_car_fields(number, date, time)
+        if error:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=error)
 
-        if len(date) != 10:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Date must be 10 characters and format YYYY-MM-DD")
-
-        if len(time) != 8:
-            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
-                                detail="Time must be 8 characters and format HH:MM:SS")
+        if INGEST_MODE == "async":
+            result = await ingestion_queue.enqueue(
+                kind="car", number=number, date=date, time=time, filename=image.filename,
+                content=await spool_upload(image)
+            )
+            return accepted_response(result)
 
         return await create_car(db=db, number=number, date=date, time=time, image=image)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
 
+@router.post("/batch", response_model=CarBatchResponse)
+async def create_cars_batch_endpoint(
+        numbers: List[str] = Form(..., description="The numbers of the cars", alias="car-number"),
+        dates: List[str] = Form(..., description="The dates of the cars", alias="car-date"),
+        times: List[str] = Form(..., description="The times of the cars", alias="car-time"),
+        images: List[UploadFile] = File(..., description="The images of the cars in the same order"),
+        db: AsyncSession = Depends(get_async_session),
+        user: User = Depends(current_active_user)
+):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+    if not len(numbers) == len(dates) == len(times) == len(images):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="car-number, car-date, car-time and images must have the same length")
+
+    if len(numbers) > CAR_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Batch must contain at most {CAR_BATCH_MAX_ITEMS} cars")
+
+    results = []
+    items = []
+    for index, (number, date, time, image) in enumerate(zip(numbers, dates, times, images)):
+        error = validate_car_fields(number, date, time)
+        if error:
+            results.append({"index": index, "status": "failed", "detail": error})
+            continue
+
+        try:
+            content = await spool_upload(image)
+        except HTTPException as e:
+            results.append({"index": index, "status": "failed", "detail": e.detail})
+            continue
+
+        items.append({
+            "index": index,
+            "number": number,
+            "date": date,
+            "time": time,
+            "filename": image.filename,
+            "content": content,
+        })
+
+    try:
+        if items:
+            results.extend(await create_cars(db=db, items=items))
+    finally:
+        for item in items:
+            discard_upload(item["content"])
+
+    results.sort(key=lambda result: result["index"])
+    created = sum(1 for result in results if result["status"] == "created")
+    collapsed = sum(1 for result in results if result["status"] == "collapsed")
+
+    return {
+        "created": created,
+        "collapsed": collapsed,
+        "failed": len(results) - created - collapsed,
+        "results": results,
+    }
+
+
 @router.get("/day")
 async def get_cars_endpoint(
         response: Response,
@@ -67,14 +148,23 @@ async def get_cars_endpoint(
             description="The date should be in format DD",
             alias="day",
         ),
+        cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page", alias="cursor"),
+        top: int = Query(10, description="The number of plates in top10", alias="top"),
+        bucket: int = Query(60, description="The minutes per graphic slot: 5, 15, 30 or 60", alias="bucket"),
         user: User = Depends(current_active_user)
 ):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
+    if not 1 <= top <= TOP_MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Top must be between 1 and {TOP_MAX_SIZE}")
+
+    if bucket not in BUCKETS:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Bucket must be one of {BUCKETS}")
+
     start_time = time.time()
 
-    cars_data = await get_cars_by_day(db=db, page=page, limit=limit, date=day)
+    cars_data = await get_cars_by_day(db=db, page=page, limit=limit, date=day, cursor=cursor, top=top, bucket=bucket)
 
     total_duration = (time.time() - start_time) * 1000
 
@@ -98,6 +188,8 @@ async def get_cars_by_month_endpoint(
             description="The date should be in format MM",
             alias="month",
         ),
+        cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page", alias="cursor"),
+        top: int = Query(10, description="The number of plates in top10", alias="top"),
         user: User = Depends(current_active_user)
 ):
     start_time = time.time()
@@ -105,7 +197,10 @@ async def get_cars_by_month_endpoint(
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    cars_data = await get_cars_by_month(db=db, page=page, limit=limit, date=month)
+    if not 1 <= top <= TOP_MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Top must be between 1 and {TOP_MAX_SIZE}")
+
+    cars_data = await get_cars_by_month(db=db, page=page, limit=limit, date=month, cursor=cursor, top=top)
 
     total_duration = (time.time() - start_time) * 1000
 
@@ -130,14 +225,19 @@ async def get_cars_endpoint(
             description="The date should be in format YYYY-WW",
             alias="week",
         ),
+        cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page", alias="cursor"),
+        top: int = Query(10, description="The number of plates in top10", alias="top"),
         user: User = Depends(current_active_user)
 ):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
+    if not 1 <= top <= TOP_MAX_SIZE:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Top must be between 1 and {TOP_MAX_SIZE}")
+
     start_time = time.time()
 
-    cars_data = await get_cars_by_week(db=db, page=page, limit=limit, week=week)
+    cars_data = await get_cars_by_week(db=db, page=page, limit=limit, week=week, cursor=cursor, top=top)
 
     total_duration = (time.time() - start_time) * 1000
 
@@ -149,10 +249,36 @@ async def get_cars_endpoint(
 
     return cars_data
 
+@router.get("/metrics/debounce")
+async def get_debounce_metrics_endpoint(user: User = Depends(current_active_user)):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+    return sighting_index.stats()
+
+
+@router.post("/migrate", status_code=status.HTTP_202_ACCEPTED)
+async def start_migration_endpoint(
+        chunk_size: int = Query(MIGRATION_CHUNK_SIZE, description="Rows per chunk", alias="chunk_size"),
+        concurrency: int = Query(MIGRATION_CONCURRENCY, description="Concurrent uploads", alias="concurrency"),
+        reset: bool = Query(False, description="Ignore the checkpoint and start from the first row", alias="reset"),
+        user: User = Depends(current_superuser)
+):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+    if not start_image_migration(chunk_size=chunk_size, concurrency=concurrency, reset=reset):
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="Migration is already running")
+
+    return {"detail": "Migration started"}
+
+
 @router.get("/migrate")
-async def search_cars_endpoint(
-        db: AsyncSession = Depends(get_async_session)):
-    await migrate_images_to_s3(db, )
+async def get_migration_endpoint(user: User = Depends(current_superuser)):
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
+
+    return migration_progress
 
 
 @router.get("/{car_number}")
@@ -168,6 +294,7 @@ async def get_car_endpoint(
             alias="date",
             example=f"{datetime.now(current_tz).strftime('%Y-%m')}",
         ),
+        cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page", alias="cursor"),
         user: User = Depends(current_active_user)
 ):
     if not user:
@@ -180,7 +307,7 @@ async def get_car_endpoint(
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Page and limit are required")
 
     start_time = time.time()
-    car_data = await get_car(db=db, page=page, limit=limit, car_number=car_number, date=date)
+    car_data = await get_car(db=db, page=page, limit=limit, car_number=car_number, date=date, cursor=cursor)
     total_duration = (time.time() - start_time) * 1000
 
     response.headers["Server-Timing"] = (
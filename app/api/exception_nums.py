@@ -1,7 +1,10 @@
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.database import get_async_session, User
+from app.config import SEARCH_MAX_LIMIT
 from app.crud.exception_nums import (
     create_exception_num,
     get_exception_nums,
@@ -44,15 +47,25 @@ async def get_exception_nums_endpoint(
 
 
 @router.get("/search")
-@cached(ttl=60)
 async def search_endpoint(
+        query: Optional[str] = Query(None, description="Plate or part of a plate", alias="q", example="95A1"),
+        match: str = Query("substring", description="prefix or substring", alias="match"),
+        page: int = Query(1, description="The page number", alias="page"),
+        limit: int = Query(20, description="The number of plates per page", alias="limit"),
         db: AsyncSession = Depends(get_async_session),
         user: User = Depends(current_active_user)
 ):
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    return await search(db)
+    if match not in ("prefix", "substring"):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Match must be prefix or substring")
+
+    if page < 1 or not 1 <= limit <= SEARCH_MAX_LIMIT:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail=f"Page must be positive and limit between 1 and {SEARCH_MAX_LIMIT}")
+
+    return await search(db, query=query.upper() if query else None, match=match, page=page, limit=limit)
 
 
 @router.delete("/{car_number}")
@@ -1,12 +1,15 @@
 from datetime import datetime
+from typing import Optional
 
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.auth.base_config import current_active_user
 from app.auth.database import get_async_session, User
-from app.config import current_tz
+from app.config import current_tz, INGEST_MODE
+from app.crud.ingestion import ingestion_queue, accepted_response
 from app.crud.unknown_car import create_unknown_car, get_unknown_cars, delete_unknown_cars
 from app.schemas.unknown_car import UnknownCarResponse
+from app.utils.file_utils import spool_upload
 from fastapi import APIRouter, Depends, Query, File, UploadFile, HTTPException, status
 from aiocache import cached
 
@@ -45,8 +48,17 @@ async def create_unknown_car_endpoint(
             raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                                 detail="Time must be 8 characters and format HH:MM:SS")
 
+        if INGEST_MODE == "async":
+            result = await ingestion_queue.enqueue(
+                kind="unknown_car", number=number, date=date, time=time, filename=image.filename,
+                content=await spool_upload(image)
+            )
+            return accepted_response(result)
+
         return await create_unknown_car(db=db, number=number, date=date, time=time, image=image)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=str(e))
 
@@ -62,13 +74,14 @@ async def get_unknown_cars_endpoint(
             example=f"{datetime.now(current_tz).strftime('%Y-%m')}"),
         page: int = Query(1, description="The page number", alias="page"),
         limit: int = Query(10, description="The number of items per page", alias="limit"),
+        cursor: Optional[str] = Query(None, description="next_cursor or prev_cursor of a previous page", alias="cursor"),
         user: User = Depends(current_active_user)
     ):
 
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Unauthorized")
 
-    return await get_unknown_cars(db=db, date=date, page=page, limit=limit)
+    return await get_unknown_cars(db=db, date=date, page=page, limit=limit, cursor=cursor)
 
 
 @router.delete("/")
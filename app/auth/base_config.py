@@ -34,6 +34,7 @@ fastapi_users = FastAPIUsers[User, int](
 )
 
 current_active_user = fastapi_users.current_user(active=True)
+current_superuser = fastapi_users.current_user(active=True, superuser=True)
 
 router.include_router(
     fastapi_users.get_auth_router(auth_backend),
@@ -22,4 +22,65 @@ AWS_SECRET_ACCESS_KEY = os.getenv("AWS_SECRET_KEY")
 AWS_BUCKET_NAME = os.getenv("AWS_BUCKET_NAME")
 AWS_ENDPOINT_URL = os.getenv("AWS_ENDPOINT_URL")
 
-BASE_PATH = os.getenv("BASE_PATH")
\ No newline at end of file
+BASE_PATH = os.getenv("BASE_PATH")
+
+CAR_BATCH_MAX_ITEMS = int(os.getenv("CAR_BATCH_MAX_ITEMS", 100))
+
+IMAGE_EXECUTOR = os.getenv("IMAGE_EXECUTOR", "thread")
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", os.cpu_count() or 1))
+IMAGE_QUEUE_DEPTH = int(os.getenv("IMAGE_QUEUE_DEPTH", 32))
+
+IMAGE_PASSTHROUGH = os.getenv("IMAGE_PASSTHROUGH", "true").lower() in ("1", "true", "yes")
+IMAGE_MAX_WIDTH = int(os.getenv("IMAGE_MAX_WIDTH", 4096))
+IMAGE_MAX_HEIGHT = int(os.getenv("IMAGE_MAX_HEIGHT", 4096))
+
+S3_MAX_CONNECTIONS = int(os.getenv("S3_MAX_CONNECTIONS", 50))
+S3_MAX_ATTEMPTS = int(os.getenv("S3_MAX_ATTEMPTS", 3))
+S3_RETRY_MODE = os.getenv("S3_RETRY_MODE", "standard")
+S3_CONNECT_TIMEOUT = float(os.getenv("S3_CONNECT_TIMEOUT", 5))
+S3_READ_TIMEOUT = float(os.getenv("S3_READ_TIMEOUT", 30))
+
+INGEST_MODE = os.getenv("INGEST_MODE", "sync")
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 1000))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", 50))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", 0.5))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", 2))
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", 5))
+INGEST_SPOOL_DIR = os.getenv("INGEST_SPOOL_DIR", "app/spool")
+
+THUMBNAIL_WIDTHS = sorted(int(width) for width in os.getenv("THUMBNAIL_WIDTHS", "320").split(",") if width.strip())
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", 75))
+
+IMAGE_CONTENT_ADDRESSED = os.getenv("IMAGE_CONTENT_ADDRESSED", "true").lower() in ("1", "true", "yes")
+IMAGE_KNOWN_KEYS_CACHE = int(os.getenv("IMAGE_KNOWN_KEYS_CACHE", 10000))
+
+SIGHTING_DEBOUNCE_SECONDS = int(os.getenv("SIGHTING_DEBOUNCE_SECONDS", 0))
+SIGHTING_UPDATE_IMAGE = os.getenv("SIGHTING_UPDATE_IMAGE", "true").lower() in ("1", "true", "yes")
+SIGHTING_MAX_PLATES = int(os.getenv("SIGHTING_MAX_PLATES", 100000))
+
+MIGRATION_CHUNK_SIZE = int(os.getenv("MIGRATION_CHUNK_SIZE", 500))
+MIGRATION_CONCURRENCY = int(os.getenv("MIGRATION_CONCURRENCY", 8))
+MIGRATION_CHECKPOINT_PATH = os.getenv("MIGRATION_CHECKPOINT_PATH", "app/migration_checkpoint.json")
+
+MAX_UPLOAD_SIZE = int(os.getenv("MAX_UPLOAD_SIZE", 20 * 1024 * 1024))
+UPLOAD_MEMORY_LIMIT = int(os.getenv("UPLOAD_MEMORY_LIMIT", 5 * 1024 * 1024))
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", 1024 * 1024))
+S3_MULTIPART_CHUNK_SIZE = int(os.getenv("S3_MULTIPART_CHUNK_SIZE", 8 * 1024 * 1024))
+
+CARS_AGGREGATION = os.getenv("CARS_AGGREGATION", "postgres")
+
+APPROXIMATE_COUNT = os.getenv("APPROXIMATE_COUNT", "false").lower() in ("1", "true", "yes")
+APPROXIMATE_COUNT_THRESHOLD = int(os.getenv("APPROXIMATE_COUNT_THRESHOLD", 100000))
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", 3))
+PARTITION_RETENTION_MONTHS = int(os.getenv("PARTITION_RETENTION_MONTHS", 0))
+PARTITION_RETENTION_ACTION = os.getenv("PARTITION_RETENTION_ACTION", "detach")
+
+SEARCH_MAX_LIMIT = int(os.getenv("SEARCH_MAX_LIMIT", 100))
+TOP_MAX_SIZE = int(os.getenv("TOP_MAX_SIZE", 100))
+
+AGGREGATION_PROCESSES = int(os.getenv("AGGREGATION_PROCESSES", 0))
+AGGREGATION_SHARD_SIZE = int(os.getenv("AGGREGATION_SHARD_SIZE", 200000))
+
+LIVE_TODAY = os.getenv("LIVE_TODAY", "false").lower() in ("1", "true", "yes")
+LIVE_TODAY_RECONCILE_SECONDS = int(os.getenv("LIVE_TODAY_RECONCILE_SECONDS", 30))
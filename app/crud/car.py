@@ -1,210 +1,545 @@
+import asyncio
+import json
+import logging
 import os
 from datetime import datetime
+from time import perf_counter
 from fastapi import UploadFile, HTTPException, status
+from sqlalchemy import insert, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import Optional
-
-from app.config import BASE_URL, AWS_ENDPOINT_URL, AWS_BUCKET_NAME, BASE_PATH
-from app.crud.cars.car_processes import (
-    process_attend_count
+from typing import List, Optional, Tuple
+
+from app.auth.database import async_session_maker
+from app.config import (
+    current_tz,
+    BASE_URL,
+    AWS_ENDPOINT_URL,
+    AWS_BUCKET_NAME,
+    BASE_PATH,
+    SIGHTING_UPDATE_IMAGE,
+    MIGRATION_CHUNK_SIZE,
+    MIGRATION_CONCURRENCY,
+    MIGRATION_CHECKPOINT_PATH,
 )
+from app.crud.daily_presence import add_daily_presence, refresh_presence_images, refresh_presence_images_by_id
+from app.crud.hourly_counts import add_hourly_counts
+from app.crud.cars.live_today import today_store
 from app.models.car import Car
+from app.models.car_daily_presence import CarDailyPresence
 from app.utils.excel_file_utils import create_excel_file
 from app.utils.file_utils import s3_manager
+from app.utils.pagination import page_and_count
+from app.utils.sightings import sighting_index
+from app.utils.time_utils import parse_observed_at, date_range
 
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
 
-async def migrate_images_to_s3(db: AsyncSession):
-    try:
-        # Получение всех записей с локальным `image_url`
-        query = select(Car).where(Car.image_url.like("/storage%"))
-        result = await db.execute(query)
-        cars = result.scalars().all()
-        print(f"Найдено {len(cars)} записей с локальным `image_url`")
-        for car in cars:
-            local_path = f'{BASE_PATH}{car.image_url}'
-            print(local_path)
-            if not os.path.exists(local_path):
-                continue
-
-            # Генерация S3 ключа (например, используем имя файла)
-            filename = os.path.basename(local_path)
-            s3_key = filename
-
-            # Загрузка файла в S3
-            s3_url = await s3_manager.upload_file(file_path=local_path, key=s3_key, content_type="image/jpeg")
 
-            # Обновление URL в базе данных
-            car.image_url = str(os.path.join(AWS_ENDPOINT_URL, AWS_BUCKET_NAME, s3_url))
-            print(f"Файл {local_path} перемещен в S3: {s3_url}")
+migration_progress = {"running": False}
+_migration_task: Optional[asyncio.Task] = None
 
-            # Удаление локального файла (опционально)
-            os.remove(local_path)
 
-            await db.commit()
+def _read_checkpoint(checkpoint_path: str) -> Tuple[int, List[int]]:
+    """Last scanned id and the ids whose images failed to migrate."""
+    try:
+        with open(checkpoint_path) as checkpoint_file:
+            checkpoint = json.load(checkpoint_file)
+        return int(checkpoint["last_id"]), [int(car_id) for car_id in checkpoint.get("failed_ids", [])]
+    except (OSError, ValueError, KeyError, TypeError):
+        return 0, []
+
+
+def _write_checkpoint(checkpoint_path: str, last_id: int, failed_ids: List[int]):
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as checkpoint_file:
+        json.dump({"last_id": last_id, "failed_ids": sorted(failed_ids)}, checkpoint_file)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def _read_file(path: str) -> bytes:
+    with open(path, "rb") as file:
+        return file.read()
+
+
+async def _migrate_image(semaphore: asyncio.Semaphore, car_id: int, image_url: str):
+    local_path = f'{BASE_PATH}{image_url}'
+    async with semaphore:
+        if not await asyncio.to_thread(os.path.exists, local_path):
+            return car_id, local_path, None
+
+        content = await asyncio.to_thread(_read_file, local_path)
+        key = await s3_manager.upload_image_bytes(content=content, key=os.path.basename(local_path))
+        return car_id, local_path, key
+
+
+async def _migrate_chunk(db: AsyncSession, rows: list, semaphore: asyncio.Semaphore, remove_local: bool) -> List[int]:
+    """Upload the images of rows, save their new URLs and return the ids that failed."""
+    outcomes = await asyncio.gather(
+        *(_migrate_image(semaphore, row.id, row.image_url) for row in rows),
+        return_exceptions=True,
+    )
+
+    updates = []
+    uploaded_paths = []
+    failed_ids = []
+    for row, outcome in zip(rows, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Ошибка при миграции изображения машины {row.id}: {outcome}")
+            migration_progress["failed"] += 1
+            failed_ids.append(row.id)
+            continue
+
+        car_id, local_path, key = outcome
+        if key is None:
+            migration_progress["missing"] += 1
+            continue
+
+        updates.append({"id": car_id, "image_url": car_image_url(key), "thumbnail_url": car_thumbnail_url(key)})
+        uploaded_paths.append(local_path)
+
+    if updates:
+        await db.execute(update(Car), updates)
+        await refresh_presence_images_by_id(db, [values["id"] for values in updates])
+    await db.commit()
+
+    # Локальные файлы удаляются только после сохранения новых ссылок
+    if remove_local:
+        for local_path in uploaded_paths:
+            await asyncio.to_thread(os.remove, local_path)
+
+    migration_progress["migrated"] += len(updates)
+    return failed_ids
+
+
+def _log_migration_progress(started: float, last_id: int):
+    elapsed = perf_counter() - started
+    migration_progress["last_id"] = last_id
+    migration_progress["elapsed_seconds"] = round(elapsed, 2)
+    migration_progress["rate_per_second"] = round(migration_progress["migrated"] / elapsed, 2) if elapsed else 0.0
+    logger.info(
+        f"Миграция: перенесено {migration_progress['migrated']}, нет файла {migration_progress['missing']}, "
+        f"ошибок {migration_progress['failed']}, последний id {last_id}, "
+        f"{migration_progress['rate_per_second']} изображений/с"
+    )
+
+
+async def migrate_images_to_s3(
+        db: AsyncSession,
+        chunk_size: int = MIGRATION_CHUNK_SIZE,
+        concurrency: int = MIGRATION_CONCURRENCY,
+        checkpoint_path: str = MIGRATION_CHECKPOINT_PATH,
+        reset: bool = False,
+        remove_local: bool = True,
+):
+    """Move images with a local `/storage` image_url to S3.
+
+    Rows are read in id-ordered chunks, each chunk is uploaded with bounded
+    concurrency and its URLs are updated with one statement. The last processed
+    id and the ids whose upload failed are written to a checkpoint file, so an
+    interrupted run continues where it stopped and the next run retries the
+    failed rows first. Progress is kept in `migration_progress`.
+    """
+    last_id, retry_ids = (0, []) if reset else _read_checkpoint(checkpoint_path)
+    semaphore = asyncio.Semaphore(concurrency)
+    started = perf_counter()
+    migration_progress.clear()
+    migration_progress.update({
+        "running": True,
+        "migrated": 0,
+        "missing": 0,
+        "failed": 0,
+        "last_id": last_id,
+        "elapsed_seconds": 0.0,
+        "rate_per_second": 0.0,
+        "error": None,
+    })
+
+    failed_ids = set()
+    try:
+        for start in range(0, len(retry_ids), chunk_size):
+            chunk_ids = retry_ids[start:start + chunk_size]
+            query = (select(Car.id, Car.image_url)
+                     .where(Car.image_url.like("/storage%"), Car.id.in_(chunk_ids))
+                     .order_by(Car.id))
+            rows = (await db.execute(query)).all()
+            if rows:
+                failed_ids.update(await _migrate_chunk(db, rows, semaphore, remove_local))
+
+            # Retry ids that were not reached yet stay in the checkpoint
+            pending_ids = failed_ids.union(retry_ids[start + chunk_size:])
+            await asyncio.to_thread(_write_checkpoint, checkpoint_path, last_id, list(pending_ids))
+            _log_migration_progress(started, last_id)
+
+        while True:
+            query = (select(Car.id, Car.image_url)
+                     .where(Car.image_url.like("/storage%"), Car.id > last_id)
+                     .order_by(Car.id)
+                     .limit(chunk_size))
+            rows = (await db.execute(query)).all()
+            if not rows:
+                break
+
+            failed_ids.update(await _migrate_chunk(db, rows, semaphore, remove_local))
+
+            last_id = rows[-1].id
+            await asyncio.to_thread(_write_checkpoint, checkpoint_path, last_id, list(failed_ids))
+            _log_migration_progress(started, last_id)
 
     except Exception as e:
         await db.rollback()
+        migration_progress["error"] = str(e)
         logger.error(f"Ошибка при миграции изображений: {e}")
         raise
+    finally:
+        migration_progress["running"] = False
+
+    return dict(migration_progress)
+
+
+async def _run_image_migration(**options):
+    async with async_session_maker() as db:
+        await migrate_images_to_s3(db, **options)
+
+
+def start_image_migration(**options) -> bool:
+    """Start the migration in the background, unless it is already running."""
+    global _migration_task
+    if _migration_task is not None and not _migration_task.done():
+        return False
+
+    _migration_task = asyncio.create_task(_run_image_migration(**options))
+    return True
+
+
+def car_image_url(key: str) -> str:
+    return str(os.path.join(AWS_ENDPOINT_URL, AWS_BUCKET_NAME, key))
+
+
+def car_thumbnail_url(key: str) -> Optional[str]:
+    thumbnail_key = s3_manager.thumbnail_key(key)
+    return car_image_url(thumbnail_key) if thumbnail_key else None
 
 
 async def create_car(db: AsyncSession, number: str, date: str, time: str, image: UploadFile):
+    observed_at = parse_observed_at(date, time)
+    if observed_at is None:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date or time format")
+
     try:
+        car_id = sighting_index.lookup(number, observed_at)
+        if car_id is not None:
+            db_car = await db.get(Car, car_id)
+            if db_car is not None:
+                return await _collapse_car(db, db_car, number, observed_at, image)
 
         file_path = await s3_manager.upload_image(image=image, key=image.filename)
-        image_url = os.path.join(AWS_ENDPOINT_URL, AWS_BUCKET_NAME, file_path)
-
-        db_car = Car(number=number, date=date, time=time, image_url=str(image_url))
+        image_url = car_image_url(file_path)
+
+        db_car = Car(
+            number=number,
+            date=date,
+            time=time,
+            image_url=image_url,
+            thumbnail_url=car_thumbnail_url(file_path),
+            observed_at=observed_at,
+        )
         db.add(db_car)
+        await add_hourly_counts(db, [(number, observed_at)])
+        await add_daily_presence(db, [{
+            "number": number,
+            "date": date,
+            "observed_at": observed_at,
+            "image_url": db_car.image_url,
+            "thumbnail_url": db_car.thumbnail_url,
+        }])
         await db.commit()
         await db.refresh(db_car)
 
         db_car.image_url = f"{image_url}"
+        sighting_index.record(number, observed_at, db_car.id)
+        today_store.add([db_car])
 
         return db_car
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def get_car(
-        db: AsyncSession,
-        car_number: Optional[str],
-        date: str,
-        page: Optional[int] = 1,
-        limit: Optional[int] = 10
-):
-    query = select(Car)
-    stmt_without_pagination = None
-
-    if not car_number:
-        if len(date) == 10:
-            stmt = query.filter_by(date=date)
+async def _collapse_car(db: AsyncSession, db_car: Car, number: str, observed_at: datetime, image: UploadFile):
+    """Merge a repeated read into the existing attendance instead of inserting a new row."""
+    if SIGHTING_UPDATE_IMAGE:
+        file_path = await s3_manager.upload_image(image=image, key=image.filename)
+        db_car.image_url = car_image_url(file_path)
+        db_car.thumbnail_url = car_thumbnail_url(file_path)
+        await refresh_presence_images(db, [db_car])
+        await db.commit()
+        await db.refresh(db_car)
+        today_store.update_images([db_car])
+
+    sighting_index.record(number, observed_at, db_car.id, collapsed=True)
+    return db_car
+
+
+def _error_detail(error: Exception) -> str:
+    return error.detail if isinstance(error, HTTPException) else str(error)
+
+
+def _error_result(index: int, error: Exception) -> dict:
+    return {
+        "index": index,
+        "status": "failed",
+        "detail": _error_detail(error),
+        "status_code": error.status_code if isinstance(error, HTTPException) else 500,
+    }
+
+
+async def create_cars(db: AsyncSession, items: list):
+    """Create many cars at once.
+
+    Each item is a dict with index, number, date, time, filename and content.
+    Images are uploaded concurrently and all new cars are inserted with one bulk
+    insert in a single transaction. Reads that repeat a recent sighting of the
+    same plate are collapsed into the existing attendance. Every item gets its
+    own result, so a bad image only fails its own item.
+    """
+    results = []
+    valid = []
+    for item in items:
+        observed_at = parse_observed_at(item["date"], item["time"])
+        if observed_at is None:
+            results.append(_error_result(item["index"], HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date or time format"
+            )))
         else:
-            stmt = query.filter(Car.date.startswith(date))
-    else:
-        query = query.filter_by(number=car_number)
-
-        if len(date) == 7:
-            query = query.filter(Car.date.startswith(date))
-            stmt_without_pagination = query.filter(Car.date.startswith(date))
+            valid.append((item, observed_at))
+
+    # Planned once, before any await, so the uploads match the plan that is executed
+    valid_plan = sighting_index.plan([(item["number"], observed_at) for item, observed_at in valid])
+
+    # Reads collapsing into an already stored car only need an upload to refresh its image
+    needs_upload = [target is None or SIGHTING_UPDATE_IMAGE for target in valid_plan]
+    uploads = await s3_manager.upload_images(
+        [item["content"] for (item, _), upload in zip(valid, needs_upload) if upload],
+        [item["filename"] for (item, _), upload in zip(valid, needs_upload) if upload],
+    )
+    uploads = iter(uploads)
+
+    accepted = []
+    plan = []
+    # Position in accepted of every read that stays in the batch, and of the read
+    # that stands in for a first read whose upload failed
+    positions = {}
+    for index, ((item, observed_at), target, upload) in enumerate(zip(valid, valid_plan, needs_upload)):
+        key = next(uploads) if upload else None
+        if target is not None and target[0] == "item":
+            leader = target[1]
+            target = ("item", positions[leader]) if leader in positions else None
+
+        if isinstance(key, Exception):
+            results.append(_error_result(item["index"], key))
+        elif target is None and key is None:
+            results.append(_error_result(item["index"], HTTPException(
+                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail="Image of the attendance was not uploaded"
+            )))
         else:
-            query = query.filter_by(date=date)
-            stmt_without_pagination = query.filter_by(date=date)
+            if target is None and valid_plan[index] is not None:
+                # The first read of this plate failed, this read becomes the attendance
+                positions[valid_plan[index][1]] = len(accepted)
+            positions[index] = len(accepted)
+            accepted.append((item, observed_at, key))
+            plan.append(target)
 
-        if limit and page:
-            stmt = query.offset((page - 1) * limit).limit(limit)
-        else:
-            stmt = query
+    if not accepted:
+        return results
+
+    try:
+        new_rows = [
+            (position, {
+                "number": item["number"],
+                "date": item["date"],
+                "time": item["time"],
+                "image_url": car_image_url(key),
+                "thumbnail_url": car_thumbnail_url(key),
+                "observed_at": observed_at,
+            })
+            for position, ((item, observed_at, key), target) in enumerate(zip(accepted, plan))
+            if target is None
+        ]
+        inserted = {}
+        if new_rows:
+            stmt = insert(Car).returning(Car, sort_by_parameter_order=True)
+            db_cars = (await db.scalars(stmt, [row for _, row in new_rows])).all()
+            inserted = {position: db_car for (position, _), db_car in zip(new_rows, db_cars)}
+            await add_hourly_counts(db, [(row["number"], row["observed_at"]) for _, row in new_rows])
+
+        image_updates = {}
+        for (item, _, key), target in zip(accepted, plan):
+            if target is None or key is None:
+                continue
 
-    result = await db.execute(stmt)
-    cars_attendances = result.scalars().all()
+            if target[0] == "item":
+                inserted[target[1]].image_url = car_image_url(key)
+                inserted[target[1]].thumbnail_url = car_thumbnail_url(key)
+            else:
+                image_updates[target[1]] = {
+                    "id": target[1],
+                    "image_url": car_image_url(key),
+                    "thumbnail_url": car_thumbnail_url(key),
+                }
+        if image_updates:
+            await db.execute(update(Car), list(image_updates.values()))
+
+        existing_ids = {target[1] for target in plan if target is not None and target[0] == "car"}
+        existing = {}
+        if existing_ids:
+            res = await db.execute(select(Car).where(Car.id.in_(existing_ids)))
+            existing = {db_car.id: db_car for db_car in res.scalars().all()}
+
+        # After the image updates, so presence rows carry the images of collapsed reads
+        await add_daily_presence(db, [
+            {
+                "number": db_car.number,
+                "date": db_car.date,
+                "observed_at": db_car.observed_at,
+                "image_url": db_car.image_url,
+                "thumbnail_url": db_car.thumbnail_url,
+            }
+            for db_car in inserted.values()
+        ])
+        await refresh_presence_images(db, [existing[car_id] for car_id in image_updates if car_id in existing])
 
-    if stmt_without_pagination is not None:
-        result_without_pagination = await db.execute(stmt_without_pagination)
-        cars_attendances_without_pagination = result_without_pagination.scalars().all()
-    else:
-        cars_attendances_without_pagination = []
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        for item, _, _ in accepted:
+            results.append(_error_result(item["index"], e))
+        return results
 
-    if not cars_attendances:
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Car attendances not found")
+    today_store.add(inserted[position] for position in sorted(inserted))
+    today_store.update_images(existing[car_id] for car_id in image_updates if car_id in existing)
 
-    response = []
+    for position, ((item, observed_at, _), target) in enumerate(zip(accepted, plan)):
+        if target is None:
+            db_car = inserted[position]
+            sighting_index.record(item["number"], observed_at, db_car.id)
+            results.append({"index": item["index"], "status": "created", "car": db_car})
+            continue
 
-    sorted_cars_attendances = sorted(
-        cars_attendances_without_pagination,
-        key=lambda x: datetime.strptime(x.time, "%H:%M:%S"),
-        reverse=True)
+        db_car = existing.get(target[1]) if target[0] == "car" else inserted[target[1]]
+        if db_car is None:
+            results.append({"index": item["index"], "status": "failed", "detail": "Car attendance not found",
+                            "status_code": status.HTTP_404_NOT_FOUND})
+            continue
 
-    first_attendances = {}
-    last_attendances = {}
+        sighting_index.record(item["number"], observed_at, db_car.id, collapsed=True)
+        results.append({"index": item["index"], "status": "collapsed", "car": db_car})
 
-    if car_number and len(date) == 7:
+    return results
+
+
+def _local_time(moment: datetime) -> str:
+    return moment.astimezone(current_tz).strftime("%H:%M:%S")
+
+
+def _presence_response(presence: CarDailyPresence) -> dict:
+    return {
+        "car_number": presence.number,
+        "first_time": _local_time(presence.first_seen),
+        "first_image": presence.first_image,
+        "first_thumbnail": presence.first_thumbnail or presence.first_image,
+        "last_time": _local_time(presence.last_seen),
+        "last_image": presence.last_image,
+        "last_thumbnail": presence.last_thumbnail or presence.last_image,
+    }
+
+
+async def get_car(
+        db: AsyncSession,
+        car_number: Optional[str],
+        date: str,
+        page: Optional[int] = 1,
+        limit: Optional[int] = 10,
+        cursor: Optional[str] = None,
+):
+    try:
+        start, end = date_range(date)
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date or cars format")
 
-        (attend_count,
-         unique_cars,
-         sorted_cars,
-         attend_count_cars,
-         attend_count_car) = process_attend_count(cars_attendances, cars_attendances_without_pagination)
-
-        for car in cars_attendances_without_pagination:
-            if car.date not in first_attendances:
-                first_attendances[car.date] = car
-            elif car.time < first_attendances[car.date].time:
-                first_attendances[car.date] = car
-
-            if car.date not in last_attendances:
-                last_attendances[car.date] = car
-            elif car.time > last_attendances[car.date].time:
-                last_attendances[car.date] = car
-
-        sorted_first_attendances = dict(
-            sorted(first_attendances.items(), key=lambda item: item[0], reverse=True)
+    if car_number and len(date) == 7:
+        # Per day summary of one plate, read from car_daily_presence
+        result = await db.execute(
+            select(CarDailyPresence)
+            .filter(CarDailyPresence.number == car_number,
+                    CarDailyPresence.date >= start.strftime("%Y-%m-%d"),
+                    CarDailyPresence.date < end.strftime("%Y-%m-%d"))
+            .order_by(CarDailyPresence.date.desc())
+        )
+        presences = result.scalars().all()
+        if not presences:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Car attendances not found")
+
+        return [
+            {"date": presence.date, **_presence_response(presence), "overall_count": presence.count}
+            for presence in presences
+        ]
+
+    if not car_number and len(date) == 10:
+        # First and last attendance of every plate of the day, read from car_daily_presence
+        result = await db.execute(
+            select(CarDailyPresence).filter_by(date=date).order_by(CarDailyPresence.first_seen)
         )
+        presences = result.scalars().all()
+        if not presences:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Car attendances not found")
 
-        for date in sorted_first_attendances:
-            response.append(
-                {
-                    "date": date,
-                    "car_number": first_attendances[date].number,
-                    "first_time": first_attendances[date].time,
-                    "first_image": first_attendances[date].image_url,
-                    "last_time": last_attendances[date].time,
-                    "last_image": last_attendances[date].image_url,
-                    "overall_count": attend_count_car[date][car_number]["count"] if date in attend_count_car else 0
-                }
-            )
-    elif car_number and len(date) == 10:
-        if limit is not None:
-            special_response = {"cars": [], "overall_count": 0}
-
-            for car in sorted_cars_attendances:
-                special_response["cars"].append({
-                    "time": car.time,
-                    "image": car.image_url,
-                })
+        return [_presence_response(presence) for presence in presences]
 
-                special_response["overall_count"] += 1
-            return special_response
+    if not car_number:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date or cars format")
 
-        else:
+    query = select(Car).filter(Car.observed_at >= start, Car.observed_at < end).filter_by(number=car_number)
+    overall_count = None
+    next_cursor = prev_cursor = None
 
-            for car in sorted_cars_attendances:
-                response.append(
-                    {
-                        "time": car.time,
-                        "image": car.image_url,
-                    }
-                )
-
-    elif not car_number and len(date) == 10:
-        unique_cars = set()
-        for car in cars_attendances:
-            if car.number not in unique_cars:
-                unique_cars.add(car.number)
-                first_attendances[car.number] = car
-                last_attendances[car.number] = car
-            else:
-                if car.time < first_attendances[car.number].time:
-                    first_attendances[car.number] = car
-                if car.time > last_attendances[car.number].time:
-                    last_attendances[car.number] = car
-
-        for number in first_attendances:
-            response.append(
-                {
-                    "car_number": number,
-                    "first_time": first_attendances[number].time,
-                    "first_image": first_attendances[number].image_url,
-                    "last_time": last_attendances[number].time,
-                    "last_image": last_attendances[number].image_url
-                }
+    if limit and (page or cursor):
+        # Only the page is loaded, the total comes from a count run right after it on the same session
+        try:
+            (cars_attendances, next_cursor, prev_cursor), (overall_count, _) = await page_and_count(
+                db, query, Car, page=page, limit=limit, cursor=cursor
             )
+        except ValueError:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
     else:
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid date or cars format")
+        result = await db.execute(query.order_by(Car.observed_at.desc()))
+        cars_attendances = result.scalars().all()
+
+    if not cars_attendances:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Car attendances not found")
 
-    return response
+    cars = [
+        {
+            "time": car.time,
+            "image": car.image_url,
+            "thumbnail": car.thumbnail_url or car.image_url,
+        }
+        for car in cars_attendances
+    ]
+
+    if limit is not None:
+        return {
+            "cars": cars,
+            "overall_count": overall_count if overall_count is not None else len(cars_attendances),
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
+        }
+
+    return cars
 
 
 async def create_excel_car(db: AsyncSession, date: str, car_number: str):
@@ -0,0 +1,107 @@
+from sqlalchemy import func, distinct, exists, cast, Integer, Time
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import current_tz
+from app.models.car import Car
+from app.models.car_hourly_count import CarHourlyCount
+from app.models.exception_nums import Number
+from app.crud.cars.car_processes import process_top10_response
+from app.utils.buckets import bucket_width, graphic_series
+
+
+def not_exception_number():
+    """Anti-join excluding plates listed in the number table (served by ix_number_number)."""
+    return ~exists().where(Number.number == Car.number)
+
+
+def period_filters(start, end) -> list:
+    """Attendances of [start, end) without exception numbers."""
+    return [Car.observed_at >= start, Car.observed_at < end, not_exception_number()]
+
+
+def local_time(column):
+    """Timestamp column as wall clock time in current_tz."""
+    return func.timezone(current_tz.zone, column)
+
+
+def rollup_filters(start, end) -> list:
+    """car_hourly_count rows of [start, end) without exception numbers."""
+    return [CarHourlyCount.hour >= start,
+            CarHourlyCount.hour < end,
+            ~exists().where(Number.number == CarHourlyCount.number)]
+
+
+async def count_cars(db: AsyncSession, filters: list):
+    """Total attendances and unique plates."""
+    result = await db.execute(select(func.count(), func.count(distinct(Car.number))).where(*filters))
+    return result.one()
+
+
+async def top_cars(db: AsyncSession, filters: list, size: int = 10) -> list:
+    """Plates with the most attendances, each with its latest attendance.
+
+    Ties are broken like top_k: latest attendance first, then the plate.
+    """
+    counts_query = (select(Car.number, func.count().label("attend_count"))
+                    .where(*filters)
+                    .group_by(Car.number)
+                    .order_by(func.count().desc(), func.max(Car.observed_at).desc(), Car.number.desc())
+                    .limit(size))
+    attend_count = {number: count for number, count in (await db.execute(counts_query)).all()}
+    if not attend_count:
+        return []
+
+    latest_query = (select(Car)
+                    .where(*filters, Car.number.in_(attend_count))
+                    .distinct(Car.number)
+                    .order_by(Car.number, Car.observed_at.desc(), Car.id.desc()))
+    latest = {car.number: car for car in (await db.execute(latest_query)).scalars().all()}
+
+    return process_top10_response([latest[number] for number in attend_count], attend_count, size)
+
+
+async def second_counts(db: AsyncSession, start, end, bucket: int = 60) -> dict:
+    """Attendances of [start, end) per slot start in seconds since midnight.
+
+    Hourly slots are read from the car_hourly_count rollup, smaller ones need
+    the car rows of the period.
+    """
+    width = bucket_width(bucket)
+    if bucket == 60:
+        slot = cast(func.extract("hour", local_time(CarHourlyCount.hour)), Integer).label("slot")
+        query = select(slot, func.sum(CarHourlyCount.count)).where(*rollup_filters(start, end)).group_by(slot)
+        return {hour * 3600: int(count) for hour, count in (await db.execute(query)).all()}
+
+    # floor, a plain cast would round 23:59:59.6 up to 86400
+    seconds = cast(func.floor(func.extract("epoch", cast(local_time(Car.observed_at), Time))), Integer)
+    slot = (seconds // width).label("slot")
+    query = select(slot, func.count()).where(*period_filters(start, end)).group_by(slot)
+    return {slot * width: count for slot, count in (await db.execute(query)).all()}
+
+
+async def date_counts(db: AsyncSession, start, end) -> dict:
+    """Attendances of [start, end) per day, read from the car_hourly_count rollup."""
+    day = func.to_char(local_time(CarHourlyCount.hour), "YYYY-MM-DD").label("day")
+    query = select(day, func.sum(CarHourlyCount.count)).where(*rollup_filters(start, end)).group_by(day)
+    return {day: int(count) for day, count in (await db.execute(query)).all()}
+
+
+async def graphic_counts(db: AsyncSession, start, end, graphic: str, bucket: int = 60) -> list:
+    """Dense chart series of [start, end)."""
+    if graphic == "time":
+        return graphic_series(graphic, start, end, await second_counts(db, start, end, bucket), {}, bucket)
+    return graphic_series(graphic, start, end, {}, await date_counts(db, start, end), bucket)
+
+
+async def aggregate_cars(db: AsyncSession, start, end, graphic: str, top: int = 10, bucket: int = 60) -> dict:
+    """Counts, top plates and the graphic series of a period, computed by Postgres."""
+    filters = period_filters(start, end)
+    general_count, total_cars = await count_cars(db, filters)
+
+    return {
+        "general_count": general_count,
+        "top10": await top_cars(db, filters, size=top),
+        "total_cars": total_cars,
+        "graphic": await graphic_counts(db, start, end, graphic, bucket),
+    }
@@ -0,0 +1,199 @@
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import AGGREGATION_PROCESSES, AGGREGATION_SHARD_SIZE
+from app.models.car import Car
+from app.crud.cars.top_k import top_k
+from app.utils.buckets import seconds_of_day, graphic_series
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+COLUMNS = ("id", "number", "date", "time", "image_url", "thumbnail_url")
+ID, NUMBER, DATE, TIME, IMAGE_URL, THUMBNAIL_URL = range(len(COLUMNS))
+
+
+async def fetch_car_rows(db: AsyncSession, filters: list) -> list:
+    """Attendances as plain tuples in COLUMNS order, without building ORM objects."""
+    result = await db.execute(select(*(getattr(Car, column) for column in COLUMNS)).where(*filters))
+    return result.all()
+
+
+def car_row(car) -> tuple:
+    """Car (or any object with the same attributes) as a tuple in COLUMNS order."""
+    return tuple(getattr(car, column) for column in COLUMNS)
+
+
+def latest_key(row: tuple) -> tuple:
+    """Orders the rows of a plate by attendance time, like observed_at and id in Postgres."""
+    return row[DATE], row[TIME], row[ID]
+
+
+def latest_time(row: tuple) -> tuple:
+    """Tie-break of top_k for a plate represented by its latest row, like max(observed_at) in top_cars."""
+    return row[DATE], row[TIME]
+
+
+def first_rows(rows) -> dict:
+    """Earliest row of every plate, by the same order as latest_key."""
+    first = {}
+    for row in rows:
+        number = row[NUMBER]
+        if number not in first or latest_key(row) < latest_key(first[number]):
+            first[number] = row
+    return first
+
+
+def top_response(row: tuple, attend_count: int) -> dict:
+    """Entry of top10 for a plate represented by row."""
+    return {
+        "attend_id": row[ID],
+        "car_number": row[NUMBER],
+        "attend_date": row[DATE],
+        "attend_time": row[TIME],
+        "image_url": row[IMAGE_URL],
+        "thumbnail_url": row[THUMBNAIL_URL] or row[IMAGE_URL],
+        "attend_count": attend_count,
+    }
+
+
+class AttendanceAggregator:
+    """Counts, top plates and graphic buckets of attendances in a single pass.
+
+    Rows are tuples in COLUMNS order. Every plate is represented by its latest
+    row. Aggregators of consecutive shards can be merged in shard order, which
+    gives the same result as one pass over all rows: every dict keeps the order
+    of first appearance, like car_processes does.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.attend_count = {}
+        self.latest_rows = {}
+        self.date_counts = {}
+        self.time_counts = {}
+
+    def add(self, row: tuple):
+        self.count += 1
+
+        number = row[NUMBER]
+        if number in self.attend_count:
+            self.attend_count[number] += 1
+            if latest_key(row) > latest_key(self.latest_rows[number]):
+                self.latest_rows[number] = row
+        else:
+            self.attend_count[number] = 1
+            self.latest_rows[number] = row
+
+        date = row[DATE]
+        self.date_counts[date] = self.date_counts.get(date, 0) + 1
+
+        # Parsed once per distinct HH:MM:SS in graphic, not once per row
+        time = row[TIME]
+        self.time_counts[time] = self.time_counts.get(time, 0) + 1
+
+    def add_all(self, rows) -> "AttendanceAggregator":
+        for row in rows:
+            self.add(row)
+        return self
+
+    def merge(self, other: "AttendanceAggregator") -> "AttendanceAggregator":
+        """Merge the aggregator of the rows that follow this one's rows."""
+        self.count += other.count
+        for number, count in other.attend_count.items():
+            if number in self.attend_count:
+                self.attend_count[number] += count
+                if latest_key(other.latest_rows[number]) > latest_key(self.latest_rows[number]):
+                    self.latest_rows[number] = other.latest_rows[number]
+            else:
+                self.attend_count[number] = count
+                self.latest_rows[number] = other.latest_rows[number]
+        for date, count in other.date_counts.items():
+            self.date_counts[date] = self.date_counts.get(date, 0) + count
+        for time, count in other.time_counts.items():
+            self.time_counts[time] = self.time_counts.get(time, 0) + count
+        return self
+
+    @property
+    def unique_cars(self) -> set:
+        return set(self.attend_count)
+
+    def top(self, size: int = 10) -> list:
+        latest = {number: latest_time(row) for number, row in self.latest_rows.items()}
+        return [top_response(self.latest_rows[number], self.attend_count[number])
+                for number in top_k(self.attend_count, latest, size)]
+
+    def graphic(self, graphic: str, start, end, bucket: int = 60) -> list:
+        second_counts = {}
+        for time, count in self.time_counts.items():
+            seconds = seconds_of_day(time)
+            second_counts[seconds] = second_counts.get(seconds, 0) + count
+        return graphic_series(graphic, start, end, second_counts, self.date_counts, bucket)
+
+    def result(self, graphic: str, start, end, top: int = 10, bucket: int = 60) -> dict:
+        return {
+            "general_count": self.count,
+            "top10": self.top(top),
+            "total_cars": len(self.attend_count),
+            "graphic": self.graphic(graphic, start, end, bucket),
+        }
+
+
+def aggregate_shard(rows: list) -> AttendanceAggregator:
+    """Worker entry point, has to live on module level to be picklable."""
+    return AttendanceAggregator().add_all(rows)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=AGGREGATION_PROCESSES)
+        logger.info(f"Aggregation process pool started with {AGGREGATION_PROCESSES} workers")
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def aggregate_rows(rows: list, graphic: str, start, end, top: int = 10, bucket: int = 60) -> dict:
+    return aggregate_shard(rows).result(graphic, start, end, top, bucket)
+
+
+async def aggregate_attendances(rows: list, graphic: str, start, end, top: int = 10, bucket: int = 60) -> dict:
+    """Aggregate the rows (tuples in COLUMNS order) of the period [start, end).
+
+    Small periods are aggregated in place. Periods of more than
+    AGGREGATION_SHARD_SIZE rows are aggregated in a thread so the event loop
+    keeps serving requests, or, with AGGREGATION_PROCESSES set, split into shards
+    that are aggregated in the shared process pool and merged in order.
+    """
+    if len(rows) <= AGGREGATION_SHARD_SIZE:
+        return aggregate_rows(rows, graphic, start, end, top, bucket)
+
+    if not AGGREGATION_PROCESSES:
+        return await asyncio.to_thread(aggregate_rows, rows, graphic, start, end, top, bucket)
+
+    shard_size = max(AGGREGATION_SHARD_SIZE, -(-len(rows) // AGGREGATION_PROCESSES))
+    # Plain tuples pickle faster than result rows
+    shards = [[tuple(row) for row in rows[start:start + shard_size]] for start in range(0, len(rows), shard_size)]
+
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    aggregators = await asyncio.gather(*(loop.run_in_executor(pool, aggregate_shard, shard) for shard in shards))
+
+    aggregator = aggregators[0]
+    for other in aggregators[1:]:
+        aggregator.merge(other)
+    return aggregator.result(graphic, start, end, top, bucket)
@@ -2,7 +2,7 @@ from datetime import datetime
 from typing import Optional
 
 from app.config import BASE_URL
-from app.utils.time_utils import round_time_slot
+from app.utils.buckets import seconds_of_day, time_series
 
 
 def process_last_attendances(cars_with_pagination):
@@ -14,7 +14,8 @@ def process_last_attendances(cars_with_pagination):
             "car_number": car.number,
             "attend_date": car.date,
             "attend_time": car.time,
-            "image_url": car.image_url
+            "image_url": car.image_url,
+            "thumbnail_url": car.thumbnail_url or car.image_url,
         })
 
     return last_attendances
@@ -65,7 +66,7 @@ def process_attend_count(cars, cars_attendances_without_pagination: Optional = N
     return attend_count, unique_cars, sorted_cars, attend_count_cars, attend_count_car
 
 
-def process_top10_response(sorted_cars, attend_count):
+def process_top10_response(sorted_cars, attend_count, size: int = 10):
     top10response = []
     added_cars = set()
     for car in sorted_cars:
@@ -77,25 +78,26 @@ def process_top10_response(sorted_cars, attend_count):
                 "attend_date": car.date,
                 "attend_time": car.time,
                 "image_url": car.image_url,
+                "thumbnail_url": car.thumbnail_url or car.image_url,
                 "attend_count": attend_count[car.number]
             })
             added_cars.add(car.number)
-            if len(top10response) == 10:
+            if len(top10response) == size:
                 break
 
     return top10response
 
 
-def process_rounded_time(cars):
-    time_slots = {}
+def process_rounded_time(cars, bucket: int = 60):
+    second_counts = {}
     for car in cars:
-        rounded_time = round_time_slot(datetime.strptime(car.time, "%H:%M:%S"))
-        if rounded_time not in time_slots:
-            time_slots[rounded_time] = 1
+        seconds = seconds_of_day(car.time)
+        if seconds not in second_counts:
+            second_counts[seconds] = 1
         else:
-            time_slots[rounded_time] += 1
+            second_counts[seconds] += 1
 
-    return [{"time": time, "count": count} for time, count in time_slots.items()]
+    return time_series(second_counts, bucket)
 
 
 def process_rounded_month(cars):
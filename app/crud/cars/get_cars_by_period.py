@@ -0,0 +1,87 @@
+import time
+from typing import Optional
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import CARS_AGGREGATION
+from app.models.car import Car
+from app.utils.pagination import paginate
+from app.crud.cars.aggregates import aggregate_cars, period_filters
+from app.crud.cars.aggregator import fetch_car_rows, aggregate_attendances
+from app.crud.cars.columnar import aggregate_columnar
+from app.crud.cars.live_today import today_store
+from app.crud.cars.car_processes import process_last_attendances
+
+
+async def get_cars_by_period(
+        db: AsyncSession,
+        start,
+        end,
+        graphic: str,
+        page: Optional[int] = 1,
+        limit: Optional[int] = 10,
+        cursor: Optional[str] = None,
+        top: int = 10,
+        bucket: int = 60,
+        live: bool = False,
+):
+    """Attendances of [start, end) for the day, week and month dashboards.
+
+    Exception numbers are excluded in SQL, so the page, the counts, the top
+    plates and the graphic are all computed over the same filtered set; top is
+    the number of plates returned in top10, bucket the slot width in minutes of
+    the time graphic. Counts and the top plates are aggregated by Postgres, the
+    graphic is read from the hourly rollup (sub-hour slots from the car rows),
+    only the requested page is loaded as Car objects, by keyset when a cursor is
+    given. CARS_AGGREGATION=python aggregates all rows of the period in process
+    with a single pass (optionally sharded over a process pool),
+    CARS_AGGREGATION=columnar computes the same output with NumPy/pandas.
+    With live set, the aggregates of today come from the in-memory today_store.
+    """
+    filters = period_filters(start, end)
+
+    pag_query_start = time.time()
+    try:
+        pag_cars, next_cursor, prev_cursor = await paginate(
+            db, select(Car).filter(*filters), Car, page=page, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    pag_query_duration = (time.time() - pag_query_start) * 1000
+
+    calculation_start = time.time()
+    query_duration = 0.0
+    if live:
+        aggregates = await today_store.aggregate(db, top, bucket)
+    elif CARS_AGGREGATION == "python":
+        query_start = time.time()
+        rows = await fetch_car_rows(db, filters)
+        query_duration = (time.time() - query_start) * 1000
+
+        aggregates = await aggregate_attendances(rows, graphic, start, end, top, bucket)
+    elif CARS_AGGREGATION == "columnar":
+        query_start = time.time()
+        rows = await fetch_car_rows(db, filters)
+        query_duration = (time.time() - query_start) * 1000
+
+        aggregates = await aggregate_columnar(rows, graphic, start, end, top, bucket)
+    else:
+        aggregates = await aggregate_cars(db, start, end, graphic, top, bucket)
+    calculation_duration = (time.time() - calculation_start) * 1000 - query_duration
+
+    return {
+        "general": process_last_attendances(pag_cars),
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+        "general_count": aggregates["general_count"],
+        "top10": aggregates["top10"],
+        "total_cars": aggregates["total_cars"],
+        "graphic": aggregates["graphic"],
+        "timing": {
+            "query_duration": query_duration + pag_query_duration,
+            "pag_query_duration": pag_query_duration,
+            "calculation_duration": calculation_duration,
+        }
+    }
@@ -0,0 +1,241 @@
+import asyncio
+import logging
+import time
+from array import array
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.auth.database import async_session_maker
+from app.config import current_tz, LIVE_TODAY, LIVE_TODAY_RECONCILE_SECONDS
+from app.models.car import Car
+from app.models.exception_nums import Number
+from app.crud.cars.aggregator import (
+    ID, NUMBER, DATE, TIME, fetch_car_rows, car_row, latest_key, latest_time, top_response,
+)
+from app.crud.cars.top_k import top_k
+from app.utils.buckets import BUCKETS, SECONDS_PER_DAY, bucket_width, seconds_of_day, time_series
+from app.utils.time_utils import day_range
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# The smallest bucket, every other bucket is a multiple of it
+SLOT_WIDTH = bucket_width(min(BUCKETS))
+SLOTS = SECONDS_PER_DAY // SLOT_WIDTH
+
+
+def current_day() -> str:
+    return datetime.now(current_tz).strftime("%Y-%m-%d")
+
+
+class TodayStore:
+    """Attendances of the current day in current_tz, kept in memory for /car/day.
+
+    Every attendance is a compact record in parallel arrays (id, 5 minute slot,
+    plate code). Plates keep their attendance count and latest row, slots keep
+    their count, so the counts, the top plates and the graphic of today are
+    answered without reading the day from Postgres. Exception numbers are
+    subtracted when answering; the number table is read at most every
+    reconcile_seconds, so its changes apply within that time.
+
+    The store is loaded from the car table on startup and starts empty at
+    midnight. It is reloaded whenever the number of cars or the last id of the
+    day in Postgres differ from its own (cars written by another worker,
+    deleted rows), checked at most every reconcile_seconds.
+    """
+
+    def __init__(self, enabled: bool = False, reconcile_seconds: int = 30):
+        self.enabled = enabled
+        self.reconcile_seconds = reconcile_seconds
+        self._lock = asyncio.Lock()
+        self._pending: Optional[list] = None
+        self._exception_numbers = frozenset()
+        self._exception_numbers_at: Optional[float] = None
+        self._reset(None, loaded=False)
+
+    def _reset(self, day: Optional[str], loaded: bool):
+        self.day = day
+        self.loaded = loaded
+        self.reconciled_at = 0.0
+
+        self.ids = array("q")
+        self.slots = array("l")
+        self.codes = array("l")
+        self.last_id = 0
+
+        self.numbers = []
+        self.plate_codes = {}
+        self.attend_count = {}
+        self.latest_rows = {}
+        self.latest_keys = {}
+        self.slot_counts = [0] * SLOTS
+
+        self.excluded = frozenset()
+        self.excluded_rows = 0
+        self.excluded_slots = [0] * SLOTS
+
+    def _roll(self):
+        day = current_day()
+        if day != self.day:
+            if self.day is not None:
+                logger.info(f"Live today store rolled over from {self.day} to {day}")
+            # A store that was live starts the new day empty, the first answer reconciles it
+            self._reset(day, loaded=self.loaded)
+
+    def _add_row(self, row: tuple):
+        if row[DATE] != self.day:
+            return
+
+        number = row[NUMBER]
+        code = self.plate_codes.get(number)
+        if code is None:
+            code = self.plate_codes[number] = len(self.numbers)
+            self.numbers.append(number)
+            self.attend_count[number] = 0
+
+        slot = seconds_of_day(row[TIME]) // SLOT_WIDTH
+        self.ids.append(row[ID])
+        self.slots.append(slot)
+        self.codes.append(code)
+        self.last_id = max(self.last_id, row[ID])
+
+        self.attend_count[number] += 1
+        key = latest_key(row)
+        if number not in self.latest_keys or key > self.latest_keys[number]:
+            self.latest_rows[number] = row
+            self.latest_keys[number] = key
+
+        self.slot_counts[slot] += 1
+        if number in self.excluded:
+            self.excluded_rows += 1
+            self.excluded_slots[slot] += 1
+
+    def add(self, cars: Iterable):
+        """Record committed cars."""
+        if not self.enabled:
+            return
+
+        self._roll()
+        rows = [car_row(car) for car in cars]
+        if self._pending is not None:
+            self._pending.extend(rows)
+        elif self.loaded:
+            for row in rows:
+                self._add_row(row)
+
+    def update_images(self, cars: Iterable):
+        """Refresh the images of cars whose image was replaced by a collapsed read."""
+        if not self.enabled:
+            return
+
+        for car in cars:
+            row = self.latest_rows.get(car.number)
+            if row is not None and row[ID] == car.id:
+                self.latest_rows[car.number] = car_row(car)
+
+    async def _load(self, db: AsyncSession):
+        day = self.day
+        start, end = day_range(day)
+
+        # Cars committed while the day is read are applied afterwards, unless the read already has them
+        self._pending = []
+        try:
+            rows = await fetch_car_rows(db, [Car.observed_at >= start, Car.observed_at < end])
+        finally:
+            pending, self._pending = self._pending, None
+
+        if day != self.day:
+            return
+
+        self._reset(day, loaded=True)
+        for row in rows:
+            self._add_row(row)
+        loaded_ids = set(self.ids)
+        for row in pending:
+            if row[ID] not in loaded_ids:
+                self._add_row(row)
+
+        self.reconciled_at = time.monotonic()
+        logger.info(f"Live today store loaded {len(self.ids)} cars of {day}")
+
+    async def _reconcile(self, db: AsyncSession):
+        start, end = day_range(self.day)
+        result = await db.execute(
+            select(func.count(), func.max(Car.id)).where(Car.observed_at >= start, Car.observed_at < end)
+        )
+        count, last_id = result.one()
+        self.reconciled_at = time.monotonic()
+
+        if count != len(self.ids) or (last_id or 0) != self.last_id:
+            logger.info(f"Live today store has {len(self.ids)} cars, Postgres {count}, reloading")
+            await self._load(db)
+
+    async def _exception_numbers_of(self, db: AsyncSession) -> frozenset:
+        now = time.monotonic()
+        if self._exception_numbers_at is None or now - self._exception_numbers_at >= self.reconcile_seconds:
+            self._exception_numbers = frozenset((await db.execute(select(Number.number))).scalars().all())
+            self._exception_numbers_at = now
+        return self._exception_numbers
+
+    async def _exclude(self, db: AsyncSession):
+        """Recount the attendances of exception numbers when the number table or the store has changed."""
+        numbers = await self._exception_numbers_of(db)
+        if numbers == self.excluded:
+            return
+
+        self.excluded = numbers
+        self.excluded_rows = 0
+        self.excluded_slots = [0] * SLOTS
+        codes = {self.plate_codes[number] for number in numbers if number in self.plate_codes}
+        if not codes:
+            return
+
+        for slot, code in zip(self.slots, self.codes):
+            if code in codes:
+                self.excluded_rows += 1
+                self.excluded_slots[slot] += 1
+
+    async def start(self):
+        if not self.enabled:
+            return
+
+        self._roll()
+        async with async_session_maker() as db:
+            async with self._lock:
+                await self._load(db)
+
+    async def aggregate(self, db: AsyncSession, top: int = 10, bucket: int = 60) -> dict:
+        """Counts, top plates and the graphic of today, same output as aggregate_cars."""
+        self._roll()
+        async with self._lock:
+            if not self.loaded:
+                await self._load(db)
+            elif time.monotonic() - self.reconciled_at >= self.reconcile_seconds:
+                await self._reconcile(db)
+            await self._exclude(db)
+
+        attend_count = self.attend_count
+        if any(number in attend_count for number in self.excluded):
+            attend_count = {number: count for number, count in attend_count.items() if number not in self.excluded}
+
+        second_counts = {}
+        for slot in range(SLOTS):
+            count = self.slot_counts[slot] - self.excluded_slots[slot]
+            if count:
+                second_counts[slot * SLOT_WIDTH] = count
+
+        latest = {number: latest_time(row) for number, row in self.latest_rows.items()}
+        return {
+            "general_count": len(self.ids) - self.excluded_rows,
+            "top10": [top_response(self.latest_rows[number], attend_count[number])
+                      for number in top_k(attend_count, latest, top)],
+            "total_cars": len(attend_count),
+            "graphic": time_series(second_counts, bucket),
+        }
+
+
+today_store = TodayStore(enabled=LIVE_TODAY, reconcile_seconds=LIVE_TODAY_RECONCILE_SECONDS)
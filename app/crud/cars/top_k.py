@@ -0,0 +1,13 @@
+import heapq
+
+
+def top_k(attend_count: dict, latest: dict, size: int) -> list:
+    """Plates with the most attendances, most attended first.
+
+    Ties are broken by the latest attendance, then by the plate itself (both
+    descending), the same order top_cars asks Postgres for. A bounded heap keeps
+    only size candidates, O(n log size) over the plates instead of sorting every
+    attendance. latest maps every plate to the time of its latest attendance,
+    e.g. the (date, time) of its latest row.
+    """
+    return heapq.nlargest(size, attend_count, key=lambda number: (attend_count[number], latest[number], number))
@@ -0,0 +1,144 @@
+from typing import Optional
+
+from sqlalchemy import case, delete, func, text, update
+from sqlalchemy.dialects.postgresql import insert, array_agg, aggregate_order_by
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.models.car import Car
+from app.models.car_daily_presence import CarDailyPresence
+
+
+async def add_daily_presence(db: AsyncSession, cars: list):
+    """Merge new attendances into car_daily_presence.
+
+    cars are dicts with number, date, observed_at, image_url and thumbnail_url.
+    Runs in the caller's transaction, so the presence rows are committed
+    together with the cars.
+    """
+    days = {}
+    for car in cars:
+        key = (car["number"], car["date"])
+        day = days.get(key)
+        if day is None:
+            days[key] = {
+                "number": car["number"],
+                "date": car["date"],
+                "first_seen": car["observed_at"],
+                "last_seen": car["observed_at"],
+                "first_image": car["image_url"],
+                "last_image": car["image_url"],
+                "first_thumbnail": car["thumbnail_url"],
+                "last_thumbnail": car["thumbnail_url"],
+                "count": 1,
+            }
+            continue
+
+        day["count"] += 1
+        if car["observed_at"] < day["first_seen"]:
+            day["first_seen"] = car["observed_at"]
+            day["first_image"] = car["image_url"]
+            day["first_thumbnail"] = car["thumbnail_url"]
+        if car["observed_at"] >= day["last_seen"]:
+            day["last_seen"] = car["observed_at"]
+            day["last_image"] = car["image_url"]
+            day["last_thumbnail"] = car["thumbnail_url"]
+
+    if not days:
+        return
+
+    stmt = insert(CarDailyPresence).values([days[key] for key in sorted(days)])
+    table = CarDailyPresence
+    earlier = stmt.excluded.first_seen < table.first_seen
+    later = stmt.excluded.last_seen >= table.last_seen
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.number, table.date],
+        set_={
+            "first_seen": case((earlier, stmt.excluded.first_seen), else_=table.first_seen),
+            "first_image": case((earlier, stmt.excluded.first_image), else_=table.first_image),
+            "first_thumbnail": case((earlier, stmt.excluded.first_thumbnail), else_=table.first_thumbnail),
+            "last_seen": case((later, stmt.excluded.last_seen), else_=table.last_seen),
+            "last_image": case((later, stmt.excluded.last_image), else_=table.last_image),
+            "last_thumbnail": case((later, stmt.excluded.last_thumbnail), else_=table.last_thumbnail),
+            "count": table.count + stmt.excluded.count,
+        },
+    ))
+
+
+async def refresh_presence_images(db: AsyncSession, cars: list):
+    """Copy the images of cars whose image changed into their presence rows."""
+    for car in cars:
+        for seen, image, thumbnail in (
+                (CarDailyPresence.first_seen, "first_image", "first_thumbnail"),
+                (CarDailyPresence.last_seen, "last_image", "last_thumbnail"),
+        ):
+            await db.execute(
+                update(CarDailyPresence)
+                .where(CarDailyPresence.number == car.number,
+                       CarDailyPresence.date == car.date,
+                       seen == car.observed_at)
+                .values({image: car.image_url, thumbnail: car.thumbnail_url})
+            )
+
+
+async def refresh_presence_images_by_id(db: AsyncSession, car_ids: list):
+    """refresh_presence_images for the cars with car_ids, in two UPDATE ... FROM car statements."""
+    if not car_ids:
+        return
+
+    for seen, image, thumbnail in (
+            (CarDailyPresence.first_seen, "first_image", "first_thumbnail"),
+            (CarDailyPresence.last_seen, "last_image", "last_thumbnail"),
+    ):
+        await db.execute(
+            update(CarDailyPresence)
+            .where(Car.id.in_(car_ids),
+                   CarDailyPresence.number == Car.number,
+                   CarDailyPresence.date == Car.date,
+                   seen == Car.observed_at)
+            .values({image: Car.image_url, thumbnail: Car.thumbnail_url})
+        )
+
+
+async def rebuild_daily_presence(db: AsyncSession, start: Optional[str] = None, end: Optional[str] = None):
+    """Recompute car_daily_presence from car for days start..end (YYYY-MM-DD, inclusive), or for all history.
+
+    The table is locked against writes until the caller's transaction ends, so
+    live upserts wait instead of racing the DELETE/INSERT. Their cars are not in
+    the rebuild's snapshot yet, so applying them afterwards keeps counts exact.
+    """
+    car_filters = []
+    presence_filters = []
+    if start is not None:
+        car_filters.append(Car.date >= start)
+        presence_filters.append(CarDailyPresence.date >= start)
+    if end is not None:
+        car_filters.append(Car.date <= end)
+        presence_filters.append(CarDailyPresence.date <= end)
+
+    def first(column):
+        return array_agg(aggregate_order_by(column, Car.observed_at.asc(), Car.id.asc()))[1]
+
+    def last(column):
+        return array_agg(aggregate_order_by(column, Car.observed_at.desc(), Car.id.desc()))[1]
+
+    await db.execute(text(f"LOCK TABLE {CarDailyPresence.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+    await db.execute(delete(CarDailyPresence).where(*presence_filters))
+    result = await db.execute(
+        insert(CarDailyPresence).from_select(
+            ["number", "date", "first_seen", "last_seen", "first_image", "last_image",
+             "first_thumbnail", "last_thumbnail", "count"],
+            select(
+                Car.number,
+                Car.date,
+                func.min(Car.observed_at),
+                func.max(Car.observed_at),
+                first(Car.image_url),
+                last(Car.image_url),
+                first(Car.thumbnail_url),
+                last(Car.thumbnail_url),
+                func.count(),
+            ).where(*car_filters).group_by(Car.number, Car.date),
+        )
+    )
+    return result.rowcount
@@ -14,8 +14,10 @@ from app.crud.car import get_car
 from app.utils.excel_file_utils import create_excel_file
 
 from app.models.exception_nums import StartEndTime
-from app.models.car import Car
 from app.crud.cars import get_cars_by_day
+from app.crud.cars.aggregates import period_filters
+from app.crud.cars.aggregator import AttendanceAggregator, TIME, fetch_car_rows, first_rows, top_response
+from app.utils.time_utils import day_range
 
 
 async def define_date_type(db: AsyncSession, date: str):
@@ -43,8 +45,11 @@ async def store_daily_report():
     async for session in get_async_session():
         async with session.begin():
             response = await get_cars_by_day(db=session, page=1, limit=10, date=current_date)
-            result = await session.execute(select(Car).filter_by(date=current_date))
-            cars_attendances = result.scalars().all()
+            start, end = day_range(current_date)
+            rows = await fetch_car_rows(session, period_filters(start, end))
+            aggregator = AttendanceAggregator().add_all(rows)
+            # The paid time window applies to the first attendance of a plate, not its latest
+            first_seen = first_rows(rows)
 
             start_and_end_res = await session.execute(select(StartEndTime).limit(1))
             start_and_end = start_and_end_res.scalars().first()
@@ -52,40 +57,20 @@ async def store_daily_report():
             START_TIME = start_and_end.start_time
             END_TIME = start_and_end.end_time
 
-            attend_count = {}
-            unique_cars = set()
-            for car in cars_attendances:
-                if car.number not in attend_count:
-                    attend_count[car.number] = 1
-                else:
-                    attend_count[car.number] += 1
-
-                if car.number not in unique_cars:
-                    unique_cars.add(car.number)
-
-            sorted_cars = sorted(cars_attendances, key=lambda x: attend_count[x.number], reverse=True)
-
-            all_car_response = []
-            all_cars = set()
-            for car in sorted_cars:
-                if car.number not in all_cars:
-                    all_car_response.append({
-                        "attend_id": car.id,
-                        "car_number": car.number,
-                        "attend_date": car.date,
-                        "attend_time": car.time,
-                        "image_url": car.image_url,
-                        "attend_count": attend_count[car.number]
-                    })
-                    all_cars.add(car.number)
+            all_car_response = [
+                top_response(first_seen[car["car_number"]], car["attend_count"])
+                for car in aggregator.top(size=len(aggregator.attend_count))
+            ]
 
             top10 = response["top10"]
             total_cars = response["total_cars"]
 
             top10_cars = []
             for car in top10:
+                first = first_seen.get(car["car_number"])
+                first_time = first[TIME] if first else car["attend_time"]
                 if car["attend_count"] > 2:
-                    if START_TIME <= car["attend_time"] <= END_TIME:
+                    if START_TIME <= first_time <= END_TIME:
                         top10_cars.append(car)
 
             cars_attendances_count = 0
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
@@ -30,39 +32,45 @@ async def delete_exception_num(db: AsyncSession, car_number: str):
     return {"detail": "Number deleted"}
 
 
-async def search(db: AsyncSession):
-    res = await db.execute(select(Car))
-    cars = res.scalars().all()
+def escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
 
-    unique_numbers = set()
-    unique_cars = set()
-    for car in cars:
-        if car.number not in unique_numbers:
-            unique_numbers.add(car.number)
-
-        if car not in unique_cars:
-            unique_cars.add(car)
-
-    last_attendance = {}
-    for unique_car in unique_cars:
-        if unique_car.number not in last_attendance:
-            last_attendance[unique_car.number] = {"date": unique_car.date, "time": unique_car.time}
-        else:
-            current_last = last_attendance[unique_car.number]
-            if unique_car.date > current_last["date"] or (
-                    unique_car.date == current_last["date"] and unique_car.time > current_last["time"]):
-                last_attendance[unique_car.number] = {
-                    "date": unique_car.date,
-                    "time": unique_car.time,
-                    "image_url": unique_car.image_url
-                }
+
+async def search(
+        db: AsyncSession,
+        query: Optional[str] = None,
+        match: str = "substring",
+        page: int = 1,
+        limit: int = 20,
+):
+    """Plates matching query, each with its last attendance.
+
+    DISTINCT ON (number) walks ix_car_number_observed_at and keeps the newest row
+    of every plate, partial plates are matched with ILIKE through the pg_trgm
+    index ix_car_number_trgm.
+    """
+    stmt = (select(Car)
+            .distinct(Car.number)
+            .order_by(Car.number, Car.observed_at.desc(), Car.id.desc()))
+
+    if query:
+        pattern = escape_like(query)
+        pattern = f"{pattern}%" if match == "prefix" else f"%{pattern}%"
+        stmt = stmt.filter(Car.number.ilike(pattern, escape="\\"))
+
+    res = await db.execute(stmt.offset((page - 1) * limit).limit(limit))
+    cars = res.scalars().all()
 
     response = []
-    for unique_number in unique_numbers:
+    for car in cars:
         response.append(
             {
-                "number": unique_number,
-                "last_attendance": last_attendance[unique_number]
+                "number": car.number,
+                "last_attendance": {
+                    "date": car.date,
+                    "time": car.time,
+                    "image_url": car.image_url
+                }
             }
         )
     return response
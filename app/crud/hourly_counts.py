@@ -0,0 +1,62 @@
+from collections import Counter
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import delete, func, text
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+
+from app.config import current_tz
+from app.models.car import Car
+from app.models.car_hourly_count import CarHourlyCount
+from app.utils.time_utils import hour_bucket
+
+
+async def add_hourly_counts(db: AsyncSession, sightings: list):
+    """Add (number, observed_at) attendances to car_hourly_count.
+
+    Runs in the caller's transaction, so the rollup is committed together with
+    the cars it counts.
+    """
+    counts = Counter((hour_bucket(observed_at), number) for number, observed_at in sightings)
+    if not counts:
+        return
+
+    stmt = insert(CarHourlyCount).values([
+        {"hour": hour, "number": number, "count": count}
+        for (hour, number), count in sorted(counts.items())
+    ])
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[CarHourlyCount.hour, CarHourlyCount.number],
+        set_={"count": CarHourlyCount.count + stmt.excluded.count},
+    ))
+
+
+async def rebuild_hourly_counts(db: AsyncSession, start: Optional[datetime] = None, end: Optional[datetime] = None):
+    """Recompute car_hourly_count from car for [start, end), or for all history.
+
+    start and end should be on hour boundaries, otherwise the edge hours only
+    count part of their attendances. The table is locked against writes until
+    the caller's transaction ends, like in rebuild_daily_presence.
+    """
+    hour = func.timezone(current_tz.zone, func.date_trunc("hour", func.timezone(current_tz.zone, Car.observed_at)))
+
+    car_filters = []
+    rollup_filters = []
+    if start is not None:
+        car_filters.append(Car.observed_at >= start)
+        rollup_filters.append(CarHourlyCount.hour >= start)
+    if end is not None:
+        car_filters.append(Car.observed_at < end)
+        rollup_filters.append(CarHourlyCount.hour < end)
+
+    await db.execute(text(f"LOCK TABLE {CarHourlyCount.__tablename__} IN SHARE ROW EXCLUSIVE MODE"))
+    await db.execute(delete(CarHourlyCount).where(*rollup_filters))
+    result = await db.execute(
+        insert(CarHourlyCount).from_select(
+            ["hour", "number", "count"],
+            select(hour, Car.number, func.count()).where(*car_filters).group_by(hour, Car.number),
+        )
+    )
+    return result.rowcount
@@ -0,0 +1,481 @@
+import asyncio
+import fcntl
+import json
+import logging
+import os
+import shutil
+import uuid
+from time import perf_counter, time_ns
+from typing import Optional
+
+from fastapi import HTTPException, status
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert
+
+from app.auth.database import async_session_maker
+from app.config import (
+    INGEST_QUEUE_SIZE,
+    INGEST_BATCH_SIZE,
+    INGEST_FLUSH_INTERVAL,
+    INGEST_WORKERS,
+    INGEST_RETRY_DELAY,
+    INGEST_SPOOL_DIR,
+    UPLOAD_MEMORY_LIMIT,
+)
+from app.crud.car import create_cars
+from app.crud.unknown_car import unknown_car_image_url, unknown_car_thumbnail_url
+from app.models.unknown_car import UnknownCar
+from app.utils.file_utils import SpooledImage, UploadContent, discard_upload, s3_manager
+from app.utils.time_utils import parse_observed_at
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class IngestionQueue:
+    """Write-behind queue for camera events.
+
+    Requests are accepted as soon as the event is written to the local spool and
+    queued. Workers drain the queue in micro-batches: images of a batch are
+    uploaded concurrently and the rows are inserted with one multi-row insert per
+    model (cars go through create_cars, so repeated reads are debounced too).
+
+    Every process spools into its own subdirectory of spool_dir and holds an
+    flock on it while it runs. On start a process adopts the subdirectories whose
+    lock is free (their process has exited) and replays them, so events of a
+    live process are never replayed by another one.
+    """
+
+    def __init__(
+            self,
+            maxsize: int,
+            batch_size: int,
+            flush_interval: float,
+            workers: int,
+            retry_delay: float,
+            spool_dir: Optional[str] = None,
+    ):
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.workers = workers
+        self.retry_delay = retry_delay
+        self.spool_dir = spool_dir or None
+        # Subdirectory of spool_dir owned by this process and the open file holding its lock
+        self._own_spool: Optional[str] = None
+        self._spool_lock = None
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self._capacity = asyncio.Semaphore(maxsize)
+        self._tasks = []
+        self._replay_task: Optional[asyncio.Task] = None
+        # Workers waiting for the first event of a batch, they hold no events and can be cancelled
+        self._idle = set()
+        self._closing = False
+        # Retry tasks waiting out retry_delay, with the events they will requeue
+        self._retries = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.running:
+            return
+
+        if self.spool_dir:
+            await asyncio.to_thread(self._claim_spool)
+
+        self._closing = False
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        if self.spool_dir:
+            # Read the spool before accepting requests, so new events are not replayed twice
+            events = await asyncio.to_thread(self._read_spool)
+            self._replay_task = asyncio.create_task(self._replay(events))
+
+        logger.info(f"Ingestion queue started with {self.workers} workers")
+
+    async def stop(self):
+        # Stop accepting, let busy workers finish the batch they already took off the queue,
+        # so it is neither lost nor replayed after being committed
+        self._closing = True
+        tasks = list(self._tasks)
+        for task in tasks:
+            if task in self._idle:
+                task.cancel()
+        if self._replay_task is not None:
+            self._replay_task.cancel()
+            tasks.append(self._replay_task)
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._replay_task = None
+
+        retries = self._retries
+        self._retries = {}
+        for task in retries:
+            task.cancel()
+        await asyncio.gather(*retries, return_exceptions=True)
+        for task, events in retries.items():
+            # Cancelled in its sleep, so its events never made it back to the queue
+            if task.cancelled():
+                for event in events:
+                    self.queue.put_nowait(event)
+
+        if self.spool_dir:
+            logger.info(f"Ingestion queue stopped, {self.queue.qsize()} events left in spool")
+            await asyncio.to_thread(self._release_spool)
+            return
+
+        # Without a spool the remaining events only live in memory, flush them now
+        while not self.queue.empty():
+            batch = [self.queue.get_nowait() for _ in range(min(self.batch_size, self.queue.qsize()))]
+            await self._flush(batch, retry=False)
+
+    async def enqueue(self, kind: str, number: str, date: str, time: str, filename: str, content: UploadContent) -> dict:
+        if self._closing:
+            discard_upload(content)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Ingestion queue is shutting down, retry later",
+                headers={"Retry-After": str(max(1, int(self.flush_interval)))},
+            )
+
+        if self._capacity.locked():
+            discard_upload(content)
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Ingestion queue is full, retry later",
+                headers={"Retry-After": str(max(1, int(self.flush_interval)))},
+            )
+
+        await self._capacity.acquire()
+        event = {
+            "id": f"{time_ns()}-{uuid.uuid4().hex}",
+            "kind": kind,
+            "number": number,
+            "date": date,
+            "time": time,
+            "filename": filename,
+        }
+
+        try:
+            if self.spool_dir:
+                await asyncio.to_thread(self._write_spool, event, content)
+        except Exception:
+            self._capacity.release()
+            discard_upload(content)
+            raise
+
+        event["content"] = content
+        self.queue.put_nowait(event)
+
+        return {"id": event["id"], "status": "accepted"}
+
+    def _spool_paths(self, event_id: str):
+        return (
+            os.path.join(self._own_spool, f"{event_id}.json"),
+            os.path.join(self._own_spool, f"{event_id}.img"),
+        )
+
+    @staticmethod
+    def _try_lock(path: str):
+        """Open and flock path without waiting, None if another process holds it."""
+        lock_file = open(path, "a")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            lock_file.close()
+            return None
+        return lock_file
+
+    def _claim_spool(self):
+        name = f"worker-{uuid.uuid4().hex}"
+        # Locked under a hidden name first, so no other process sees it unlocked and adopts it
+        claim_path = os.path.join(self.spool_dir, f".{name}")
+        os.makedirs(claim_path)
+        self._spool_lock = self._try_lock(os.path.join(claim_path, "lock"))
+        self._own_spool = os.path.join(self.spool_dir, name)
+        os.rename(claim_path, self._own_spool)
+
+    def _release_spool(self):
+        self._spool_lock.close()
+        # Events left behind are adopted by the next process that starts
+        if not any(name.endswith(".json") for name in os.listdir(self._own_spool)):
+            shutil.rmtree(self._own_spool, ignore_errors=True)
+        self._own_spool = None
+        self._spool_lock = None
+
+    def _adopt_spools(self):
+        """Move the events of exited processes (and of the old flat layout) into the own spool."""
+        for name in sorted(os.listdir(self.spool_dir)):
+            path = os.path.join(self.spool_dir, name)
+            if path == self._own_spool:
+                continue
+
+            if os.path.isfile(path):
+                if name.endswith(".json"):
+                    # os.rename is atomic, only the process that claimed the metadata moves the image
+                    try:
+                        os.rename(path, os.path.join(self._own_spool, name))
+                    except FileNotFoundError:
+                        continue
+                    image_name = f"{name[:-len('.json')]}.img"
+                    try:
+                        os.rename(os.path.join(self.spool_dir, image_name), os.path.join(self._own_spool, image_name))
+                    except FileNotFoundError:
+                        # Reported as a broken entry by _read_spool
+                        pass
+                continue
+
+            if not name.startswith("worker-"):
+                continue
+
+            lock_file = self._try_lock(os.path.join(path, "lock"))
+            if lock_file is None:
+                continue
+            try:
+                # Images first, so a claimed .json never points at an image left behind
+                for entry in sorted(os.listdir(path), key=lambda entry: entry.endswith(".json")):
+                    if entry.endswith((".json", ".img")):
+                        os.rename(os.path.join(path, entry), os.path.join(self._own_spool, entry))
+                shutil.rmtree(path, ignore_errors=True)
+            except FileNotFoundError:
+                # Adopted by another process that started at the same time
+                pass
+            finally:
+                lock_file.close()
+
+    def _write_spool(self, event: dict, content: UploadContent):
+        meta_path, image_path = self._spool_paths(event["id"])
+        if isinstance(content, SpooledImage):
+            # A large upload is already on disk, move it instead of copying it through memory
+            shutil.move(content.path, image_path)
+            content.path = image_path
+        else:
+            with open(image_path, "wb") as image_file:
+                image_file.write(content)
+
+        # The metadata file is written last and atomically, so a replay never sees half an event
+        tmp_path = f"{meta_path}.tmp"
+        with open(tmp_path, "w") as meta_file:
+            json.dump(event, meta_file)
+        os.replace(tmp_path, meta_path)
+
+    def _remove_spool(self, event: dict):
+        if not self.spool_dir:
+            return
+
+        for path in self._spool_paths(event["id"]):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _read_spool(self):
+        self._adopt_spools()
+        events = []
+        for name in sorted(os.listdir(self._own_spool)):
+            if not name.endswith(".json"):
+                continue
+
+            meta_path, image_path = self._spool_paths(name[:-len(".json")])
+            try:
+                with open(meta_path) as meta_file:
+                    event = json.load(meta_file)
+                if os.path.getsize(image_path) > UPLOAD_MEMORY_LIMIT:
+                    event["content"] = SpooledImage.from_file(image_path)
+                else:
+                    with open(image_path, "rb") as image_file:
+                        event["content"] = image_file.read()
+            except (OSError, ValueError) as e:
+                logger.error(f"Skipping broken spool entry {meta_path}: {e}")
+                continue
+
+            events.append(event)
+        return events
+
+    async def _replay(self, events: list):
+        if events:
+            logger.info(f"Replaying {len(events)} spooled events")
+
+        for event in events:
+            await self._capacity.acquire()
+            self.queue.put_nowait(event)
+
+    async def _next_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        task = asyncio.current_task()
+        self._idle.add(task)
+        try:
+            batch = [await self.queue.get()]
+        finally:
+            self._idle.discard(task)
+        deadline = loop.time() + self.flush_interval
+
+        while len(batch) < self.batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _worker(self):
+        while not self._closing:
+            batch = await self._next_batch()
+            try:
+                await self._flush(batch)
+            except Exception as e:
+                # Retry what was not flushed, otherwise its capacity and spool files are never released
+                pending = [event for event in batch if not event.get("done")]
+                logger.error(f"Ingestion worker failed to flush {len(batch)} events, retrying {len(pending)}: {e}")
+                self._retry(pending)
+
+    async def _flush(self, batch: list, retry: bool = True):
+        flush_start = perf_counter()
+        car_events = [event for event in batch if event["kind"] == "car"]
+        unknown_car_events = [event for event in batch if event["kind"] == "unknown_car"]
+
+        outcomes = await asyncio.gather(
+            self._flush_cars(car_events),
+            self._flush_unknown_cars(unknown_car_events),
+            return_exceptions=True,
+        )
+        failed = []
+        for events, outcome in zip((car_events, unknown_car_events), outcomes):
+            if isinstance(outcome, Exception):
+                logger.error(f"Flush of {len(events)} events failed: {outcome}")
+                failed.extend(event for event in events if not event.get("done"))
+            else:
+                failed.extend(outcome)
+
+        if failed:
+            if retry:
+                self._retry(failed)
+            else:
+                logger.error(f"Lost {len(failed)} events that could not be flushed")
+                for event in failed:
+                    discard_upload(event["content"])
+
+        logger.info(
+            f"Flushed {len(batch) - len(failed)} of {len(batch)} events "
+            f"in {(perf_counter() - flush_start) * 1000:.2f} ms"
+        )
+
+    async def _flush_cars(self, events: list) -> list:
+        """Flush car events through create_cars and return the events worth retrying."""
+        if not events:
+            return []
+
+        items = [
+            {
+                "index": index,
+                "number": event["number"],
+                "date": event["date"],
+                "time": event["time"],
+                "filename": event["filename"],
+                "content": event["content"],
+            }
+            for index, event in enumerate(events)
+        ]
+        async with async_session_maker() as db:
+            results = await create_cars(db=db, items=items)
+
+        failed = []
+        for result in results:
+            event = events[result["index"]]
+            if result["status"] != "failed":
+                self._done(event)
+            elif result["status_code"] < 500:
+                # The event itself is bad, retrying would not help
+                logger.error(f"Dropping event {event['id']}: {result['detail']}")
+                self._done(event)
+            else:
+                logger.error(f"Flush of event {event['id']} failed: {result['detail']}")
+                failed.append(event)
+
+        return failed
+
+    async def _flush_unknown_cars(self, events: list) -> list:
+        if not events:
+            return []
+
+        uploads = await s3_manager.upload_images(
+            [event["content"] for event in events],
+            [event["filename"] for event in events],
+        )
+
+        rows = []
+        uploaded = []
+        failed = []
+        for event, upload in zip(events, uploads):
+            observed_at = parse_observed_at(event["date"], event["time"])
+            if observed_at is None:
+                logger.error(f"Dropping event {event['id']}: invalid date or time format")
+                self._done(event)
+            elif isinstance(upload, HTTPException) and upload.status_code < 500:
+                logger.error(f"Dropping event {event['id']}: {upload.detail}")
+                self._done(event)
+            elif isinstance(upload, Exception):
+                logger.error(f"Upload of event {event['id']} failed: {upload}")
+                failed.append(event)
+            else:
+                rows.append({
+                    "number": event["number"],
+                    "date": event["date"],
+                    "time": event["time"],
+                    "image_url": unknown_car_image_url(upload),
+                    "thumbnail_url": unknown_car_thumbnail_url(upload),
+                    "observed_at": observed_at,
+                })
+                uploaded.append(event)
+
+        if rows:
+            try:
+                async with async_session_maker() as db:
+                    await db.execute(insert(UnknownCar), rows)
+                    await db.commit()
+            except Exception as e:
+                logger.error(f"Insert of {len(rows)} unknown cars failed: {e}")
+                failed.extend(uploaded)
+            else:
+                for event in uploaded:
+                    self._done(event)
+
+        return failed
+
+    def _done(self, event: dict):
+        if event.get("done"):
+            return
+        event["done"] = True
+        self._remove_spool(event)
+        discard_upload(event["content"])
+        self._capacity.release()
+
+    def _retry(self, events: list):
+        if not events:
+            return
+        task = asyncio.create_task(self._requeue(events))
+        self._retries[task] = events
+        task.add_done_callback(lambda done: self._retries.pop(done, None))
+
+    async def _requeue(self, events: list):
+        await asyncio.sleep(self.retry_delay)
+        for event in events:
+            self.queue.put_nowait(event)
+
+
+def accepted_response(result: dict) -> JSONResponse:
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=result)
+
+
+ingestion_queue = IngestionQueue(
+    maxsize=INGEST_QUEUE_SIZE,
+    batch_size=INGEST_BATCH_SIZE,
+    flush_interval=INGEST_FLUSH_INTERVAL,
+    workers=INGEST_WORKERS,
+    retry_delay=INGEST_RETRY_DELAY,
+    spool_dir=INGEST_SPOOL_DIR,
+)
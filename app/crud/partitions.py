@@ -0,0 +1,161 @@
+import asyncio
+import logging
+from datetime import datetime
+
+import schedule
+from sqlalchemy import text
+
+from app.auth.database import engine
+from app.config import (
+    current_tz,
+    PARTITION_MONTHS_AHEAD,
+    PARTITION_RETENTION_MONTHS,
+    PARTITION_RETENTION_ACTION,
+)
+from app.utils.partitions import (
+    PARTITIONED_TABLES,
+    month_start,
+    add_months,
+    partition_name,
+    default_partition_name,
+    parse_partition_name,
+    create_partition_sql,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+async def is_partitioned(connection, table: str) -> bool:
+    result = await connection.execute(
+        text("SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:table)"),
+        {"table": table},
+    )
+    return result.scalar() is not None
+
+
+async def get_partitions(connection, table: str) -> list:
+    result = await connection.execute(
+        text("SELECT child.relname FROM pg_inherits "
+             "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+             "WHERE pg_inherits.inhparent = to_regclass(:table)"),
+        {"table": table},
+    )
+    return result.scalars().all()
+
+
+async def default_has_rows(connection, table: str, month: datetime) -> bool:
+    result = await connection.execute(
+        text(f"SELECT 1 FROM {default_partition_name(table)} "
+             f"WHERE observed_at >= :start AND observed_at < :end LIMIT 1"),
+        {"start": month, "end": add_months(month, 1)},
+    )
+    return result.scalar() is not None
+
+
+async def create_partition_from_default(connection, table: str, month: datetime):
+    """Create the partition of month and move its rows out of the DEFAULT partition.
+
+    Postgres refuses to create a partition while the DEFAULT partition holds rows
+    of its range, so DEFAULT is detached for the move and attached back. Runs in
+    the caller's transaction, so either everything happens or nothing does.
+    """
+    default = default_partition_name(table)
+    await connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {default}"))
+    await connection.execute(text(create_partition_sql(table, month)))
+    result = await connection.execute(
+        text(f"WITH moved AS ("
+             f"  DELETE FROM {default} WHERE observed_at >= :start AND observed_at < :end RETURNING *"
+             f") INSERT INTO {table} SELECT * FROM moved"),
+        {"start": month, "end": add_months(month, 1)},
+    )
+    await connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {default} DEFAULT"))
+    logger.info(f"Moved {result.rowcount} rows of {month.strftime('%Y-%m')} from {default} "
+                f"to {partition_name(table, month)}")
+
+
+async def create_upcoming_partitions(connection, table: str, months_ahead: int) -> list:
+    """Create the partitions of the current month and the next months_ahead months."""
+    current_month = month_start(datetime.now(current_tz))
+    existing = set(await get_partitions(connection, table))
+    has_default = default_partition_name(table) in existing
+
+    created = []
+    for offset in range(months_ahead + 1):
+        month = add_months(current_month, offset)
+        if partition_name(table, month) in existing:
+            continue
+        if has_default and await default_has_rows(connection, table, month):
+            await create_partition_from_default(connection, table, month)
+        else:
+            await connection.execute(text(create_partition_sql(table, month)))
+        created.append(month.strftime("%Y-%m"))
+
+    return created
+
+
+async def apply_retention(connection, table: str, retention_months: int, action: str) -> list:
+    """Detach or drop partitions that ended more than retention_months months ago."""
+    oldest_kept = add_months(month_start(datetime.now(current_tz)), -retention_months)
+
+    removed = []
+    for name in await get_partitions(connection, table):
+        month = parse_partition_name(table, name)
+        if month is None or month >= oldest_kept:
+            continue
+
+        if action == "drop":
+            await connection.execute(text(f"DROP TABLE {name}"))
+        else:
+            await connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        removed.append(name)
+
+    return removed
+
+
+async def try_maintenance_lock(connection, table: str) -> bool:
+    """Transaction level advisory lock, so only one process maintains table at a time."""
+    result = await connection.execute(
+        text("SELECT pg_try_advisory_xact_lock(hashtext(:name))"),
+        {"name": f"maintain_partitions:{table}"},
+    )
+    return bool(result.scalar())
+
+
+async def maintain_partitions(
+        months_ahead: int = PARTITION_MONTHS_AHEAD,
+        retention_months: int = PARTITION_RETENTION_MONTHS,
+        action: str = PARTITION_RETENTION_ACTION,
+):
+    """Create upcoming monthly partitions and apply the retention policy.
+
+    retention_months=0 keeps every partition. Tables that are not partitioned
+    yet (the migration has not run) are skipped, and so are tables another
+    process is maintaining right now (every worker runs the schedule).
+    """
+    for table in PARTITIONED_TABLES:
+        try:
+            async with engine.begin() as connection:
+                if not await is_partitioned(connection, table):
+                    logger.warning(f"Table {table} is not partitioned, skipping partition maintenance")
+                    continue
+
+                if not await try_maintenance_lock(connection, table):
+                    logger.info(f"Partitions of {table} are maintained by another process, skipping")
+                    continue
+
+                created = await create_upcoming_partitions(connection, table, months_ahead)
+                removed = []
+                if retention_months > 0:
+                    removed = await apply_retention(connection, table, retention_months, action)
+        except Exception as e:
+            logger.error(f"Partition maintenance of {table} failed: {e}")
+            continue
+
+        if created or removed:
+            logger.info(f"Partitions of {table}: created {created}, {action} {removed}")
+
+
+def schedule_partition_maintenance():
+    # Runs on the shared schedule loop started in app.crud.daily_report
+    schedule.every().day.at("00:15", current_tz).do(lambda: asyncio.create_task(maintain_partitions()))
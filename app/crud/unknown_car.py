@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from typing import Optional
 
 from fastapi import UploadFile, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
@@ -8,14 +9,36 @@ from sqlalchemy.future import select
 from app.config import BASE_URL, AWS_ENDPOINT_URL
 from app.models.unknown_car import UnknownCar
 from app.utils.file_utils import s3_manager
+from app.utils.pagination import page_and_count
+from app.utils.time_utils import parse_observed_at, date_range
+
+
+def unknown_car_image_url(key: str) -> str:
+    return f"{AWS_ENDPOINT_URL}{key}"
+
+
+def unknown_car_thumbnail_url(key: str) -> Optional[str]:
+    thumbnail_key = s3_manager.thumbnail_key(key)
+    return unknown_car_image_url(thumbnail_key) if thumbnail_key else None
 
 
 async def create_unknown_car(db: AsyncSession, number: str, date: str, time: str, image: UploadFile):
+    observed_at = parse_observed_at(date, time)
+    if observed_at is None:
+        raise HTTPException(status_code=400, detail="Invalid date or time format")
+
     try:
         file_path = await s3_manager.upload_image(image=image, key=image.filename)
-        image_url = f"{AWS_ENDPOINT_URL}{file_path}"
-
-        db_unknown_car = UnknownCar(number=number, date=date, time=time, image_url=image_url)
+        image_url = unknown_car_image_url(file_path)
+
+        db_unknown_car = UnknownCar(
+            number=number,
+            date=date,
+            time=time,
+            image_url=image_url,
+            thumbnail_url=unknown_car_thumbnail_url(file_path),
+            observed_at=observed_at,
+        )
         db.add(db_unknown_car)
         await db.commit()
         await db.refresh(db_unknown_car)
@@ -23,25 +46,42 @@ async def create_unknown_car(db: AsyncSession, number: str, date: str, time: str
         db_unknown_car.image_url = f"{image_url}"
 
         return db_unknown_car
+    except HTTPException:
+        await db.rollback()
+        raise
     except Exception as e:
         await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def get_unknown_cars(db: AsyncSession, date: str, page: int = 1, limit: int = 10):
-    query = select(UnknownCar)
-    if len(date) == 10:
-        query = query.filter_by(date=date).order_by(UnknownCar.time.desc())
-    else:
-        query = query.filter(UnknownCar.date.startswith(date)).order_by(UnknownCar.date.desc(), UnknownCar.time.desc())
+async def get_unknown_cars(
+        db: AsyncSession,
+        date: str,
+        page: int = 1,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+):
+    try:
+        start, end = date_range(date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format")
 
-    res = await db.execute(query.offset((page - 1) * limit).limit(limit))
-    res_without_pagination = await db.execute(query)
+    query = select(UnknownCar).filter(UnknownCar.observed_at >= start, UnknownCar.observed_at < end)
 
-    unknown_cars = res.scalars().all()
-    unknown_cars_without_pagination = res_without_pagination.scalars().all()
+    try:
+        (unknown_cars, next_cursor, prev_cursor), (total_attendance, approximate) = await page_and_count(
+            db, query, UnknownCar, page=page, limit=limit, cursor=cursor
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
-    response = {"unknown_cars": [], "total_attendance": len(unknown_cars_without_pagination)}
+    response = {
+        "unknown_cars": [],
+        "total_attendance": total_attendance,
+        "total_is_approximate": approximate,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
 
     for unknown_car in unknown_cars:
         response["unknown_cars"].append(
@@ -49,7 +89,8 @@ async def get_unknown_cars(db: AsyncSession, date: str, page: int = 1, limit: in
                 "unknown_num": unknown_car.number,
                 "attend_date": unknown_car.date,
                 "attend_time": unknown_car.time,
-                "image_url": unknown_car.image_url
+                "image_url": unknown_car.image_url,
+                "thumbnail_url": unknown_car.thumbnail_url or unknown_car.image_url,
             }
         )
 
@@ -10,14 +10,32 @@ from app.auth.base_config import router as auth_router
 from app.auth.database import create_db_and_tables
 
 from app.api import router
+from app.config import INGEST_MODE
+from app.crud.cars.aggregator import shutdown_pool as shutdown_aggregation_pool
+from app.crud.cars.live_today import today_store
+from app.crud.ingestion import ingestion_queue
+from app.crud.partitions import maintain_partitions, schedule_partition_maintenance
+from app.utils.file_utils import s3_manager
+from app.utils.image_utils import image_processor
 
 
 @asynccontextmanager
 async def lifespan(main_app: FastAPI):
     await create_db_and_tables()
+    await maintain_partitions()
+    schedule_partition_maintenance()
+    await today_store.start()
+    await s3_manager.start()
+    if INGEST_MODE == "async":
+        await ingestion_queue.start()
 
     yield
 
+    await ingestion_queue.stop()
+    await s3_manager.close()
+    image_processor.shutdown()
+    shutdown_aggregation_pool()
+
 app = FastAPI(
     title="Car scan market",
     version="0.1",
@@ -0,0 +1,20 @@
+import datetime
+
+from sqlalchemy import TIMESTAMP
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.auth.database import Base
+
+
+class CarDailyPresence(Base):
+    __tablename__ = 'car_daily_presence'
+
+    number: Mapped[str] = mapped_column(primary_key=True)
+    date: Mapped[str] = mapped_column(primary_key=True, index=True)
+    first_seen: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(timezone=True))
+    last_seen: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(timezone=True))
+    first_image: Mapped[str] = mapped_column(nullable=True)
+    last_image: Mapped[str] = mapped_column(nullable=True)
+    first_thumbnail: Mapped[str] = mapped_column(nullable=True)
+    last_thumbnail: Mapped[str] = mapped_column(nullable=True)
+    count: Mapped[int] = mapped_column(default=0)
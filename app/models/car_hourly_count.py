@@ -0,0 +1,14 @@
+import datetime
+
+from sqlalchemy import TIMESTAMP
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.auth.database import Base
+
+
+class CarHourlyCount(Base):
+    __tablename__ = 'car_hourly_count'
+
+    hour: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(timezone=True), primary_key=True)
+    number: Mapped[str] = mapped_column(primary_key=True)
+    count: Mapped[int] = mapped_column(default=0)
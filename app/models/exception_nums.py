@@ -7,7 +7,7 @@ class Number(Base):
     __tablename__ = 'number'
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
-    number: Mapped[str] = mapped_column()
+    number: Mapped[str] = mapped_column(index=True)
 
 
 class StartEndTime(Base):
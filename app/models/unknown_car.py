@@ -1,6 +1,6 @@
 import datetime
 
-from sqlalchemy import TIMESTAMP
+from sqlalchemy import TIMESTAMP, Index, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.auth.database import Base
@@ -8,12 +8,19 @@ from app.auth.database import Base
 
 class UnknownCar(Base):
     __tablename__ = 'unknown_car'
+    __table_args__ = (
+        Index('ix_unknown_car_observed_at', 'observed_at', postgresql_include=['number']),
+        Index('ix_unknown_car_observed_at_id', text('observed_at DESC'), text('id DESC')),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True)
     number: Mapped[str] = mapped_column()
     date: Mapped[str] = mapped_column()
     time: Mapped[str] = mapped_column()
     image_url: Mapped[str] = mapped_column(nullable=True)
+    thumbnail_url: Mapped[str] = mapped_column(nullable=True)
+    # Partition key, the table's primary key is (id, observed_at), see migration f3c81d2b6e94
+    observed_at: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(timezone=True), nullable=False)
 
     created_at: Mapped[datetime.datetime] = mapped_column(TIMESTAMP(timezone=True),
                                                           default=lambda: datetime.datetime.now(datetime.timezone.utc))
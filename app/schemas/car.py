@@ -1,7 +1,7 @@
 import datetime
 
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List
 
 
 class CarResponse(BaseModel):
@@ -10,6 +10,7 @@ class CarResponse(BaseModel):
     date: str = Field(..., description="The date of the car")
     time: str = Field(..., description="The time of the car")
     image_url: Optional[str] = Field(None, description="The image URL of the car")
+    thumbnail_url: Optional[str] = Field(None, description="The thumbnail URL of the car image")
 
     created_at: datetime.datetime = Field(..., description="The time the car was created")
     updated_at: datetime.datetime = Field(..., description="The time the car was updated")
@@ -24,7 +25,22 @@ class CarResponse(BaseModel):
                 "date": "2022-01-01",
                 "time": "12:00",
                 "image_url": "http://example.com/image.jpg",
+                "thumbnail_url": "http://example.com/thumbs/320/image.jpg",
                 "created_at": "2022-01-01T12:00:00",
                 "updated_at": "2022-01-01T12:00:00"
             }
         }
+
+
+class CarBatchItemResult(BaseModel):
+    index: int = Field(..., description="Position of the item in the batch request")
+    status: str = Field(..., description="created, collapsed into a recent attendance, or failed")
+    detail: Optional[str] = Field(None, description="The reason the item failed")
+    car: Optional[CarResponse] = Field(None, description="The created car or the attendance it was collapsed into")
+
+
+class CarBatchResponse(BaseModel):
+    created: int = Field(0, description="The number of created cars")
+    collapsed: int = Field(0, description="The number of reads collapsed into recent attendances")
+    failed: int = Field(0, description="The number of failed items")
+    results: List[CarBatchItemResult] = Field([], description="Per item results in request order")
@@ -10,6 +10,7 @@ class UnknownCarResponse(BaseModel):
     date: str = Field(..., description="The date of the car")
     time: str = Field(..., description="The time of the car")
     image_url: Optional[str] = Field(None, description="The image URL of the car")
+    thumbnail_url: Optional[str] = Field(None, description="The thumbnail URL of the car image")
 
     created_at: datetime.datetime = Field(..., description="The time the car was created")
     updated_at: datetime.datetime = Field(..., description="The time the car was updated")
@@ -24,6 +25,7 @@ class UnknownCarResponse(BaseModel):
                 "date": "2022-01-01",
                 "time": "12:00",
                 "image_url": "http://example.com/image.jpg",
+                "thumbnail_url": "http://example.com/thumbs/320/image.jpg",
                 "created_at": "2022-01-01T12:00:00",
                 "updated_at": "2022-01-01T12:00:00"
             }
@@ -0,0 +1,116 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.crud.cars.car_processes import (
+    process_attend_count,
+    process_top10_response,
+    process_rounded_time,
+    process_rounded_month,
+    process_rounded_weekday,
+)
+from app.crud.cars.aggregator import COLUMNS, aggregate_shard
+from app.crud.cars.columnar import aggregate_rows
+from app.config import current_tz
+from app.utils.buckets import WEEKDAYS, day_series
+
+PERIOD_START = datetime(2024, 1, 1)
+
+
+def generate_rows(size: int, plates: int, days: int, seed: int = 0) -> list:
+    """Synthetic attendances in COLUMNS order."""
+    rng = random.Random(seed)
+    numbers = [f"{rng.randint(1, 99):02}A{rng.randint(0, 999):03}{rng.choice('ABCDEFGH')}{rng.choice('ABCDEFGH')}"
+               for _ in range(plates)]
+    first_day = PERIOD_START
+
+    rows = []
+    for row_id in range(1, size + 1):
+        seconds = rng.randrange(24 * 60 * 60)
+        image_url = f"https://s3.example.com/car_{row_id}.jpg"
+        rows.append((
+            row_id,
+            rng.choice(numbers),
+            (first_day + timedelta(days=rng.randrange(days))).strftime("%Y-%m-%d"),
+            f"{seconds // 3600:02}:{seconds // 60 % 60:02}:{seconds % 60:02}",
+            image_url,
+            image_url.replace("car_", "thumbs/320/car_") if row_id % 3 else None,
+        ))
+    return rows
+
+
+def graphic_objects(cars: list, graphic: str, start, end) -> list:
+    """The graphic of the original functions as dense, ordered series."""
+    if graphic == "time":
+        return process_rounded_time(cars)
+    if graphic == "day":
+        return day_series({slot["day"]: slot["count"] for slot in process_rounded_month(cars)}, start, end)
+    weekday_counts = {slot["weekday"]: slot["count"] for slot in process_rounded_weekday(cars)}
+    return [{"weekday": weekday, "count": weekday_counts.get(weekday, 0)} for weekday in WEEKDAYS]
+
+
+def aggregate_objects(cars: list, graphic: str, start, end) -> dict:
+    """The original car_processes functions, over plain objects.
+
+    The top 10 sorts every attendance like process_attend_count does, with the
+    tie-breaking of top_k, so that every plate is represented by its latest row.
+    """
+    attend_count, unique_cars, _, _, _ = process_attend_count(cars)
+    latest = {}
+    for car in cars:
+        key = (car.date, car.time, car.id)
+        latest[car.number] = max(latest.get(car.number, key), key)
+    sorted_cars = sorted(cars, key=lambda car: (attend_count[car.number], latest[car.number][:2], car.number,
+                                                (car.date, car.time, car.id)), reverse=True)
+    return {
+        "general_count": len(cars),
+        "top10": process_top10_response(sorted_cars, attend_count),
+        "total_cars": len(unique_cars),
+        "graphic": graphic_objects(cars, graphic, start, end),
+    }
+
+
+def aggregate_single_pass(rows: list, graphic: str, start, end) -> dict:
+    return aggregate_shard(rows).result(graphic, start, end)
+
+
+def measure(func, *args, repeat: int = 3):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        duration = time.perf_counter() - start
+        best = duration if best is None else min(best, duration)
+    return result, best
+
+
+def main(args):
+    rows = generate_rows(args.rows, args.plates, args.days)
+    cars = [SimpleNamespace(**dict(zip(COLUMNS, row))) for row in rows]
+    start = current_tz.localize(PERIOD_START)
+    end = current_tz.localize(PERIOD_START + timedelta(days=args.days))
+
+    for graphic in ("time", "day", "weekday"):
+        expected, objects_duration = measure(aggregate_objects, cars, graphic, start, end, repeat=args.repeat)
+        timings = [f"car_processes={objects_duration * 1000:.1f} ms"]
+
+        for name, engine in (("single_pass", aggregate_single_pass), ("columnar", aggregate_rows)):
+            actual, duration = measure(engine, rows, graphic, start, end, repeat=args.repeat)
+            if actual != expected:
+                raise SystemExit(f"{graphic}: {name} output differs from car_processes")
+            timings.append(f"{name}={duration * 1000:.1f} ms ({objects_duration / duration:.1f}x)")
+
+        print(f"{graphic:8} rows={len(rows)} " + " ".join(timings))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare car_processes with the single pass and columnar engines on synthetic rows")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--plates", type=int, default=20_000)
+    parser.add_argument("--days", type=int, default=31)
+    parser.add_argument("--repeat", type=int, default=3)
+
+    main(parser.parse_args())
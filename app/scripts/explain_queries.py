@@ -0,0 +1,100 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime
+
+from fastapi import HTTPException
+
+from app.auth.database import async_session_maker
+from app.config import current_tz
+from app.crud.car import get_car
+from app.crud.cars import get_cars_by_day, get_cars_by_week, get_cars_by_month
+from app.crud.cars.live_today import today_store
+from app.crud.unknown_car import get_unknown_cars
+
+
+class RecordingSession:
+    """Session that runs the statements of a crud function and keeps them for EXPLAIN.
+
+    The statements are the ones the endpoints run (exception number filters,
+    keyset ordering, counts, top plates and rollups), so the plans stay in sync
+    with the code instead of with a copy of its queries.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.statements = []
+
+    async def execute(self, stmt, *args, **kwargs):
+        self.statements.append(stmt)
+        return await self.db.execute(stmt, *args, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.db, name)
+
+
+def hot_endpoints(day: str, week: str, month: str, number: str, limit: int = 10) -> dict:
+    """The crud calls behind the dashboard endpoints, with representative parameters."""
+    return {
+        "get_cars_by_day": lambda db, cursor: get_cars_by_day(db, limit=limit, date=day, cursor=cursor),
+        "get_cars_by_week": lambda db, cursor: get_cars_by_week(db, limit=limit, week=week, cursor=cursor),
+        "get_cars_by_month": lambda db, cursor: get_cars_by_month(db, limit=limit, date=month, cursor=cursor),
+        "get_car_day": lambda db, cursor: get_car(db, car_number=number, date=day, limit=limit, cursor=cursor),
+        "get_car_month": lambda db, cursor: get_car(db, car_number=number, date=month, limit=limit, cursor=cursor),
+        "get_unknown_cars": lambda db, cursor: get_unknown_cars(db, date=month, limit=limit, cursor=cursor),
+    }
+
+
+async def record_statements(db, call) -> list:
+    """Statements of the first page and, when there is one, of the next page by cursor."""
+    statements = []
+    cursor = None
+    for _ in range(2):
+        session = RecordingSession(db)
+        try:
+            response = await call(session, cursor)
+        except HTTPException:
+            response = None
+        statements.extend(session.statements)
+
+        cursor = response.get("next_cursor") if isinstance(response, dict) else None
+        if cursor is None:
+            break
+    return statements
+
+
+async def explain(db, stmt) -> str:
+    connection = await db.connection()
+    compiled = stmt.compile(dialect=connection.dialect, compile_kwargs={"render_postcompile": True})
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await connection.exec_driver_sql(f"EXPLAIN (ANALYZE, BUFFERS) {compiled}", params)
+    return "\n".join(row[0] for row in result.all())
+
+
+async def main(args):
+    output_dir = os.path.join(args.output, args.label)
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Plans of today come from Postgres too, not from the in-memory store
+    today_store.enabled = False
+    endpoints = hot_endpoints(day=args.day, week=args.week, month=args.month, number=args.number)
+    async with async_session_maker() as db:
+        for name, call in endpoints.items():
+            for index, stmt in enumerate(await record_statements(db, call), start=1):
+                plan = await explain(db, stmt)
+                with open(os.path.join(output_dir, f"{name}_{index}.txt"), "w") as plan_file:
+                    plan_file.write(f"{stmt}\n\n{plan}\n")
+                print(f"{name}_{index}: {plan.splitlines()[-1]}")
+
+
+if __name__ == "__main__":
+    now = datetime.now(current_tz)
+    parser = argparse.ArgumentParser(description="Record EXPLAIN ANALYZE output of the hot car queries")
+    parser.add_argument("--label", default="before", help="Sub directory for this run, e.g. before or after")
+    parser.add_argument("--output", default="explain")
+    parser.add_argument("--day", default=now.strftime("%Y-%m-%d"))
+    parser.add_argument("--week", default=now.strftime("%Y-%W"))
+    parser.add_argument("--month", default=now.strftime("%Y-%m"))
+    parser.add_argument("--number", default="95A123BB")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,38 @@
+import argparse
+import asyncio
+import logging
+
+from app.auth.database import async_session_maker
+from app.config import MIGRATION_CHUNK_SIZE, MIGRATION_CONCURRENCY, MIGRATION_CHECKPOINT_PATH
+from app.crud.car import migrate_images_to_s3
+from app.utils.file_utils import s3_manager
+
+
+async def main(args):
+    await s3_manager.start()
+    try:
+        async with async_session_maker() as db:
+            progress = await migrate_images_to_s3(
+                db,
+                chunk_size=args.chunk_size,
+                concurrency=args.concurrency,
+                checkpoint_path=args.checkpoint,
+                reset=args.reset,
+                remove_local=not args.keep_local,
+            )
+    finally:
+        await s3_manager.close()
+
+    print(progress)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move images stored under /storage to S3")
+    parser.add_argument("--chunk-size", type=int, default=MIGRATION_CHUNK_SIZE)
+    parser.add_argument("--concurrency", type=int, default=MIGRATION_CONCURRENCY)
+    parser.add_argument("--checkpoint", default=MIGRATION_CHECKPOINT_PATH)
+    parser.add_argument("--reset", action="store_true", help="Ignore the checkpoint and start from the first row")
+    parser.add_argument("--keep-local", action="store_true", help="Do not delete local files after upload")
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parser.parse_args()))
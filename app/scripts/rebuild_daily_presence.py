@@ -0,0 +1,21 @@
+import argparse
+import asyncio
+
+from app.auth.database import async_session_maker
+from app.crud.daily_presence import rebuild_daily_presence
+
+
+async def main(args):
+    async with async_session_maker() as db:
+        async with db.begin():
+            rows = await rebuild_daily_presence(db, start=args.start, end=args.end)
+
+    print(f"Rebuilt car_daily_presence: {rows} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the car_daily_presence table from the car table")
+    parser.add_argument("--start", help="First day to rebuild (YYYY-MM-DD), default all history")
+    parser.add_argument("--end", help="Last day to rebuild (YYYY-MM-DD), inclusive")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,25 @@
+import argparse
+import asyncio
+
+from app.auth.database import async_session_maker
+from app.crud.hourly_counts import rebuild_hourly_counts
+from app.utils.time_utils import date_range
+
+
+async def main(args):
+    start = date_range(args.start)[0] if args.start else None
+    end = date_range(args.end)[1] if args.end else None
+
+    async with async_session_maker() as db:
+        async with db.begin():
+            rows = await rebuild_hourly_counts(db, start=start, end=end)
+
+    print(f"Rebuilt car_hourly_count: {rows} rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the car_hourly_count rollup from the car table")
+    parser.add_argument("--start", help="First day (YYYY-MM-DD) or month (YYYY-MM) to rebuild, default all history")
+    parser.add_argument("--end", help="Last day (YYYY-MM-DD) or month (YYYY-MM) to rebuild, inclusive")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,73 @@
+from datetime import date, datetime, timedelta
+
+from app.config import current_tz
+
+BUCKETS = (5, 15, 30, 60)
+SECONDS_PER_DAY = 24 * 60 * 60
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+
+
+def seconds_of_day(time: str) -> int:
+    """Секунды от полуночи для HH:MM:SS, без strptime."""
+    return int(time[0:2]) * 3600 + int(time[3:5]) * 60 + int(time[6:8])
+
+
+def bucket_width(bucket: int) -> int:
+    """Ширина слота в секундах; bucket — один из BUCKETS (минуты)."""
+    if bucket not in BUCKETS:
+        raise ValueError(f"Bucket must be one of {BUCKETS}")
+    return bucket * 60
+
+
+def slot_labels(bucket: int = 60) -> list:
+    """Подписи всех слотов суток по порядку: 00:00, 00:15, ..."""
+    width = bucket_width(bucket)
+    return [f"{start // 3600:02}:{start // 60 % 60:02}" for start in range(0, SECONDS_PER_DAY, width)]
+
+
+def time_series(second_counts: dict, bucket: int = 60) -> list:
+    """Плотный ряд по слотам суток с нулями для пустых слотов.
+
+    second_counts — количество по секундам от полуночи (или по началу любого
+    более мелкого слота). Каждая секунда попадает в слот, в котором она
+    начинается, так что 23:45 остаётся в 23:00, а не переходит в 00:00.
+    """
+    width = bucket_width(bucket)
+    counts = [0] * (SECONDS_PER_DAY // width)
+    for seconds, count in second_counts.items():
+        counts[seconds // width] += count
+    return [{"time": label, "count": count} for label, count in zip(slot_labels(bucket), counts)]
+
+
+def period_days(start: datetime, end: datetime) -> list:
+    """Даты YYYY-MM-DD периода [start, end) в current_tz."""
+    day = start.astimezone(current_tz).date()
+    last = end.astimezone(current_tz).date()
+    days = []
+    while day < last:
+        days.append(day.strftime("%Y-%m-%d"))
+        day += timedelta(days=1)
+    return days
+
+
+def day_series(date_counts: dict, start: datetime, end: datetime) -> list:
+    """Плотный ряд по дням периода с нулями для дней без посещений."""
+    return [{"day": day, "count": date_counts.get(day, 0)} for day in period_days(start, end)]
+
+
+def weekday_series(date_counts: dict) -> list:
+    """Ряд по дням недели с понедельника по воскресенье."""
+    counts = [0] * len(WEEKDAYS)
+    for day, count in date_counts.items():
+        counts[date.fromisoformat(day).weekday()] += count
+    return [{"weekday": weekday, "count": count} for weekday, count in zip(WEEKDAYS, counts)]
+
+
+def graphic_series(graphic: str, start: datetime, end: datetime, second_counts: dict, date_counts: dict,
+                   bucket: int = 60) -> list:
+    """Ряд графика периода: time — по слотам суток, day — по дням, weekday — по дням недели."""
+    if graphic == "time":
+        return time_series(second_counts, bucket)
+    if graphic == "day":
+        return day_series(date_counts, start, end)
+    return weekday_series(date_counts)
@@ -1,16 +1,139 @@
+import asyncio
+import hashlib
 import logging
-from typing import Optional
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from dataclasses import dataclass
+from typing import Optional, List, Union
 
 import aioboto3
-import cv2
-import numpy as np
+from aiobotocore.config import AioConfig
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
-from fastapi import HTTPException, status, UploadFile
+from fastapi import HTTPException, UploadFile, status
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-from app.config import AWS_BUCKET_NAME, AWS_ACCESS_KEY_ID, AWS_SECRET_ACCESS_KEY, AWS_ENDPOINT_URL
+from app.config import (
+    AWS_BUCKET_NAME,
+    AWS_ACCESS_KEY_ID,
+    AWS_SECRET_ACCESS_KEY,
+    AWS_ENDPOINT_URL,
+    S3_MAX_CONNECTIONS,
+    S3_MAX_ATTEMPTS,
+    S3_RETRY_MODE,
+    S3_CONNECT_TIMEOUT,
+    S3_READ_TIMEOUT,
+    THUMBNAIL_WIDTHS,
+    THUMBNAIL_QUALITY,
+    IMAGE_CONTENT_ADDRESSED,
+    IMAGE_KNOWN_KEYS_CACHE,
+    MAX_UPLOAD_SIZE,
+    UPLOAD_MEMORY_LIMIT,
+    UPLOAD_CHUNK_SIZE,
+    S3_MULTIPART_CHUNK_SIZE,
+)
+from app.utils.image_utils import image_processor
+
+
+def _too_large() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"Изображение больше {MAX_UPLOAD_SIZE} байт",
+    )
+
+
+def _remove_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@dataclass
+class SpooledImage:
+    """Загрузка больше UPLOAD_MEMORY_LIMIT, сохранённая во временный файл на диске."""
+    path: str
+    size: int
+    digest: str
+
+    @classmethod
+    def from_file(cls, path: str) -> "SpooledImage":
+        """Описать уже лежащий на диске файл, например из спула очереди."""
+        digest = hashlib.sha256()
+        size = 0
+        with open(path, "rb") as image_file:
+            while chunk := image_file.read(UPLOAD_CHUNK_SIZE):
+                digest.update(chunk)
+                size += len(chunk)
+        return cls(path=path, size=size, digest=digest.hexdigest())
+
+    def remove(self):
+        _remove_file(self.path)
+
+
+UploadContent = Union[bytes, SpooledImage]
+
+
+def discard_upload(content: UploadContent):
+    """Удалить временный файл загрузки, если он есть."""
+    if isinstance(content, SpooledImage):
+        content.remove()
+
+
+def _write_file(file, chunk: bytes):
+    file.write(chunk)
+
+
+async def spool_upload(image: UploadFile, max_size: int = MAX_UPLOAD_SIZE) -> UploadContent:
+    """Прочитать загрузку по частям, держа в памяти не больше UPLOAD_MEMORY_LIMIT.
+
+    Небольшие файлы возвращаются байтами, большие пишутся во временный файл
+    и возвращаются как SpooledImage, который удаляет вызывающий код.
+    """
+    if image.size is not None and image.size > max_size:
+        raise _too_large()
+
+    chunks = []
+    size = 0
+    digest = hashlib.sha256()
+    spooled = None
+    spool_file = None
+    try:
+        while chunk := await image.read(UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise _too_large()
+
+            digest.update(chunk)
+            if spool_file is None and size > UPLOAD_MEMORY_LIMIT:
+                fd, path = tempfile.mkstemp(prefix="upload-", suffix=".img")
+                spool_file = os.fdopen(fd, "wb")
+                spooled = SpooledImage(path=path, size=0, digest="")
+                await asyncio.to_thread(_write_file, spool_file, b"".join(chunks))
+                chunks = []
+
+            if spool_file is not None:
+                await asyncio.to_thread(_write_file, spool_file, chunk)
+            else:
+                chunks.append(chunk)
+    except BaseException:
+        if spool_file is not None:
+            spool_file.close()
+            spooled.remove()
+        raise
+
+    if spool_file is None:
+        return b"".join(chunks)
+
+    spool_file.close()
+    spooled.size = size
+    spooled.digest = digest.hexdigest()
+    return spooled
 
 
 class S3Manager:
@@ -18,6 +141,17 @@ class S3Manager:
         self.bucket_name = AWS_BUCKET_NAME
         self.endpoint_url = AWS_ENDPOINT_URL
         self.session = aioboto3.Session()
+        self.config = AioConfig(
+            max_pool_connections=S3_MAX_CONNECTIONS,
+            connect_timeout=S3_CONNECT_TIMEOUT,
+            read_timeout=S3_READ_TIMEOUT,
+            retries={"max_attempts": S3_MAX_ATTEMPTS, "mode": S3_RETRY_MODE},
+        )
+        self.thumbnail_widths = THUMBNAIL_WIDTHS
+        self.content_addressed = IMAGE_CONTENT_ADDRESSED
+        self._known_keys = OrderedDict()
+        self._client = None
+        self._exit_stack: Optional[AsyncExitStack] = None
 
     async def _get_client(self):
         return self.session.client(
@@ -25,14 +159,41 @@ class S3Manager:
             aws_access_key_id=AWS_ACCESS_KEY_ID,
             aws_secret_access_key=AWS_SECRET_ACCESS_KEY,
             endpoint_url=self.endpoint_url,
+            config=self.config,
         )
 
+    async def start(self):
+        """Открыть общий клиент с пулом соединений (вызывается в lifespan)."""
+        if self._client is not None:
+            return
+
+        self._exit_stack = AsyncExitStack()
+        self._client = await self._exit_stack.enter_async_context(await self._get_client())
+        logger.info(f"S3 клиент открыт, максимум соединений {S3_MAX_CONNECTIONS}")
+
+    async def close(self):
+        if self._exit_stack is not None:
+            await self._exit_stack.aclose()
+            logger.info("S3 клиент закрыт")
+
+        self._client = None
+        self._exit_stack = None
+
+    @asynccontextmanager
+    async def client(self):
+        """Общий клиент, если менеджер запущен, иначе временный (скрипты вне приложения)."""
+        if self._client is not None:
+            yield self._client
+        else:
+            async with await self._get_client() as s3_client:
+                yield s3_client
+
     async def upload_file(
         self, file_path: str, key: str, content_type: Optional[str] = None
     ):
         """Загрузить файл в S3."""
         try:
-            async with await self._get_client() as s3_client:
+            async with self.client() as s3_client:
                 extra_args = {"ContentType": content_type} if content_type else {}
                 await s3_client.upload_file(
                     Filename=file_path,
@@ -48,7 +209,7 @@ class S3Manager:
 
     async def download_file(self, key: str, download_path: str):
         try:
-            async with await self._get_client() as s3_client:
+            async with self.client() as s3_client:
                 await s3_client.download_file(
                     Bucket=self.bucket_name, Key=key, Filename=download_path
                 )
@@ -59,7 +220,7 @@ class S3Manager:
 
     async def delete_file(self, key: str):
         try:
-            async with await self._get_client() as s3_client:
+            async with self.client() as s3_client:
                 await s3_client.delete_object(Bucket=self.bucket_name, Key=key)
                 logger.info(f"Файл {key} удален из S3")
         except ClientError as e:
@@ -68,7 +229,7 @@ class S3Manager:
 
     async def get_presigned_url(self, key: str, expiration: int = 3600) -> str:
         try:
-            async with await self._get_client() as s3_client:
+            async with self.client() as s3_client:
                 url = await s3_client.generate_presigned_url(
                     ClientMethod="get_object",
                     Params={"Bucket": self.bucket_name, "Key": key},
@@ -83,35 +244,188 @@ class S3Manager:
     async def upload_image(
             self, image: UploadFile, key: str, format: str = "jpg"
     ) -> Optional[str]:
-        """Загрузить изображение в S3."""
+        """Загрузить изображение в S3.
+
+        Файл читается по частям. Изображения до UPLOAD_MEMORY_LIMIT обрабатываются
+        в памяти, большие сохраняются во временный файл (см. upload_image_file).
+        """
+        content = await spool_upload(image)
         try:
-            file_content = await image.read()
-            image_array = np.frombuffer(file_content, dtype=np.uint8)
-            image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
-
-            if image is None:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Неверный формат изображения",
-                )
+            return await self.upload_content(content, key=key, format=format)
+        finally:
+            discard_upload(content)
 
-            # Кодирование изображения в буфер
-            success, buffer = cv2.imencode(f".{format}", image)
-            if not success:
-                raise ValueError("Ошибка при кодировании изображения")
+    async def upload_content(self, content: UploadContent, key: str, format: str = "jpg") -> Optional[str]:
+        if isinstance(content, SpooledImage):
+            return await self.upload_image_file(content, key=key, format=format)
+        return await self.upload_image_bytes(content=content, key=key, format=format)
 
-            async with await self._get_client() as s3_client:
-                await s3_client.put_object(
-                    Bucket=self.bucket_name,
-                    Key=key,
-                    Body=buffer.tobytes(),
-                    ContentType="image/jpeg",
-                )
-                logger.info(f"Изображение сохранено как {key}")
+    async def _put_file(self, s3_client, key: str, path: str):
+        transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_CHUNK_SIZE,
+            multipart_chunksize=S3_MULTIPART_CHUNK_SIZE,
+            max_concurrency=4,
+        )
+        put_start = time.perf_counter()
+        await s3_client.upload_file(
+            Filename=path,
+            Bucket=self.bucket_name,
+            Key=key,
+            ExtraArgs={"ContentType": "image/jpeg"},
+            Config=transfer_config,
+        )
+        put_duration = (time.perf_counter() - put_start) * 1000
+        logger.info(f"Изображение загружено потоком как {key} за {put_duration:.2f} мс")
+
+    async def upload_image_file(self, spooled: SpooledImage, key: str, format: str = "jpg") -> Optional[str]:
+        """Загрузить большое изображение из временного файла.
+
+        Файл читается, перекодируется и уменьшается в пуле image_processor по тем
+        же правилам, что и в upload_image_bytes, там же делаются миниатюры. В S3
+        изображение передаётся потоком (multipart) из файла, целиком в памяти
+        event loop оно не держится.
+        """
+        if self.content_addressed:
+            key = self.digest_key(spooled.digest, format)
+            if await self.exists(key):
+                logger.info(f"Изображение {key} уже загружено")
                 return key
+
+        out_path = f"{spooled.path}.out"
+        try:
+            encoded, thumbnails = await image_processor.prepare_file(
+                spooled.path, out_path, format, self.thumbnail_widths, THUMBNAIL_QUALITY
+            )
+            source = out_path if encoded else spooled.path
+
+            async with self.client() as s3_client:
+                # Основной объект загружается последним: если он есть, то есть и миниатюры
+                if thumbnails is not None:
+                    await asyncio.gather(*(
+                        self._put_image(s3_client, self.thumbnail_key(key, width), thumbnail)
+                        for width, thumbnail in zip(self.thumbnail_widths, thumbnails)
+                    ))
+                else:
+                    # Ключ миниатюры должен существовать, поэтому загружаем само изображение
+                    await asyncio.gather(*(
+                        self._put_file(s3_client, self.thumbnail_key(key, width), source)
+                        for width in self.thumbnail_widths
+                    ))
+                await self._put_file(s3_client, key, source)
+
+            self._remember_key(key)
+            return key
+        except ClientError as e:
+            logger.error(f"Ошибка при потоковой загрузке изображения: {e}")
+            raise
+        finally:
+            await asyncio.to_thread(_remove_file, out_path)
+
+    @staticmethod
+    def content_key(content: bytes, format: str = "jpg") -> str:
+        """Ключ по хешу содержимого: одинаковые кадры хранятся одним объектом."""
+        return S3Manager.digest_key(hashlib.sha256(content).hexdigest(), format)
+
+    @staticmethod
+    def digest_key(digest: str, format: str = "jpg") -> str:
+        return f"sha256/{digest[:2]}/{digest}.{format}"
+
+    def _remember_key(self, key: str):
+        self._known_keys[key] = None
+        self._known_keys.move_to_end(key)
+        if len(self._known_keys) > IMAGE_KNOWN_KEYS_CACHE:
+            self._known_keys.popitem(last=False)
+
+    async def exists(self, key: str) -> bool:
+        if key in self._known_keys:
+            self._known_keys.move_to_end(key)
+            return True
+
+        try:
+            async with self.client() as s3_client:
+                await s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+        self._remember_key(key)
+        return True
+
+    def thumbnail_key(self, key: str, width: Optional[int] = None) -> Optional[str]:
+        """Ключ миниатюры изображения (по умолчанию самой маленькой)."""
+        if not self.thumbnail_widths:
+            return None
+        return f"thumbs/{width or self.thumbnail_widths[0]}/{key}"
+
+    async def _put_image(self, s3_client, key: str, body: bytes):
+        put_start = time.perf_counter()
+        await s3_client.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=body,
+            ContentType="image/jpeg",
+        )
+        put_duration = (time.perf_counter() - put_start) * 1000
+        logger.info(f"Изображение сохранено как {key} за {put_duration:.2f} мс")
+
+    async def upload_image_bytes(
+            self, content: bytes, key: str, format: str = "jpg"
+    ) -> Optional[str]:
+        """Загрузить изображение из байтов в S3.
+
+        Готовые JPEG загружаются как есть, остальные изображения перекодируются
+        в пуле image_processor, чтобы не блокировать event loop. Вместе с
+        изображением загружаются миниатюры под ключами thumbnail_key.
+
+        В режиме content_addressed ключ вычисляется по хешу содержимого, а
+        загрузка пропускается, если такой объект уже есть. Возвращает ключ.
+        """
+        try:
+            if self.content_addressed:
+                key = self.content_key(content, format)
+                if await self.exists(key):
+                    logger.info(f"Изображение {key} уже загружено")
+                    return key
+
+            buffer = await image_processor.prepare(content, format)
+            uploads = [(key, buffer)]
+
+            if self.thumbnail_widths:
+                try:
+                    thumbnails = await image_processor.thumbnails(buffer, self.thumbnail_widths, THUMBNAIL_QUALITY)
+                except HTTPException as e:
+                    # Ключ миниатюры должен существовать, поэтому загружаем оригинал
+                    logger.error(f"Не удалось создать миниатюру для {key}: {e.detail}")
+                    thumbnails = [buffer] * len(self.thumbnail_widths)
+
+                uploads.extend(
+                    (self.thumbnail_key(key, width), thumbnail)
+                    for width, thumbnail in zip(self.thumbnail_widths, thumbnails)
+                )
+
+            async with self.client() as s3_client:
+                # Основной объект загружается последним: если он есть, то есть и миниатюры
+                await asyncio.gather(
+                    *(self._put_image(s3_client, upload_key, body) for upload_key, body in uploads[1:])
+                )
+                await self._put_image(s3_client, key, buffer)
+
+            self._remember_key(key)
+            return key
         except ClientError as e:
             logger.error(f"Ошибка при загрузке изображения: {e}")
             raise
 
+    async def upload_images(self, contents: List[UploadContent], keys: List[str], format: str = "jpg") -> list:
+        """Загрузить несколько изображений параллельно.
+
+        Ошибки возвращаются на местах соответствующих изображений.
+        """
+        return await asyncio.gather(
+            *(self.upload_content(content, key=key, format=format) for content, key in zip(contents, keys)),
+            return_exceptions=True,
+        )
+
 # Инициализация менеджера S3
 s3_manager = S3Manager()
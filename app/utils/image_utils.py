@@ -0,0 +1,322 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Optional, Tuple, List
+
+import cv2
+import numpy as np
+from fastapi import HTTPException, status
+
+from app.config import (
+    IMAGE_EXECUTOR,
+    IMAGE_WORKERS,
+    IMAGE_QUEUE_DEPTH,
+    IMAGE_PASSTHROUGH,
+    IMAGE_MAX_WIDTH,
+    IMAGE_MAX_HEIGHT,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+JPEG_MAGIC = b"\xff\xd8\xff"
+JPEG_EOI = b"\xff\xd9"
+# SOF0-SOF15 без DHT (C4), JPG (C8) и DAC (CC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+# Сколько байт начала файла читать в поисках SOF (APP-сегменты вроде EXIF бывают до 64 КБ)
+JPEG_HEADER_BYTES = 256 * 1024
+REDUCED_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+class InvalidImageError(ValueError):
+    pass
+
+
+def jpeg_size(content: bytes) -> Optional[Tuple[int, int]]:
+    """Вернуть (ширина, высота) из заголовка JPEG без декодирования.
+
+    Возвращает None, если это не JPEG или заголовок повреждён.
+    """
+    if not content.rstrip(b"\x00").endswith(JPEG_EOI):
+        return None
+    return jpeg_header_size(content)
+
+
+def jpeg_file_size(path: str) -> Optional[Tuple[int, int]]:
+    """jpeg_size для файла: читаются только начало файла и его последние байты."""
+    with open(path, "rb") as image_file:
+        head = image_file.read(JPEG_HEADER_BYTES)
+        image_file.seek(max(0, os.fstat(image_file.fileno()).st_size - 1024))
+        tail = image_file.read()
+
+    if not tail.rstrip(b"\x00").endswith(JPEG_EOI):
+        return None
+    return jpeg_header_size(head)
+
+
+def jpeg_header_size(content: bytes) -> Optional[Tuple[int, int]]:
+    """(ширина, высота) из SOF; content может быть только началом файла."""
+    if not content.startswith(JPEG_MAGIC):
+        return None
+
+    index = 2
+    length = len(content)
+    while index + 4 <= length:
+        if content[index] != 0xFF:
+            return None
+
+        marker = content[index + 1]
+        if marker == 0xFF:
+            index += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            index += 2
+            continue
+        if marker in (0xD9, 0xDA):
+            return None
+
+        segment_length = int.from_bytes(content[index + 2:index + 4], "big")
+        if marker in JPEG_SOF_MARKERS:
+            if index + 9 > length:
+                return None
+            height = int.from_bytes(content[index + 5:index + 7], "big")
+            width = int.from_bytes(content[index + 7:index + 9], "big")
+            return (width, height) if width and height else None
+
+        index += 2 + segment_length
+
+    return None
+
+
+def fits(size: Optional[Tuple[int, int]], format: str, max_width: int, max_height: int) -> bool:
+    """JPEG размера size можно сохранить как есть в format."""
+    if format not in ("jpg", "jpeg") or size is None:
+        return False
+
+    width, height = size
+    return width <= max_width and height <= max_height
+
+
+def can_passthrough(content: bytes, format: str, max_width: int, max_height: int) -> bool:
+    return fits(jpeg_size(content), format, max_width, max_height)
+
+
+def reduced_flag(size: Optional[Tuple[int, int]], min_width: int, min_height: int = 0) -> int:
+    """Самый сильный IMREAD_REDUCED_*, после которого JPEG размера size не меньше min_width x min_height."""
+    if size is not None:
+        for factor, flag in REDUCED_FLAGS:
+            if size[0] // factor >= min_width and size[1] // factor >= min_height:
+                return flag
+    return cv2.IMREAD_COLOR
+
+
+def fit_image(image: np.ndarray, max_width: int, max_height: int) -> np.ndarray:
+    """Уменьшить image, чтобы оно помещалось в max_width x max_height (0 — без ограничения)."""
+    height, width = image.shape[:2]
+    if max_width and max_height and (width > max_width or height > max_height):
+        scale = min(max_width / width, max_height / height)
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+    return image
+
+
+def encode_image(content: bytes, format: str = "jpg", max_width: int = 0, max_height: int = 0) -> bytes:
+    """Декодировать изображение, при необходимости уменьшить и закодировать заново.
+
+    Выполняется в пуле воркеров, поэтому функция должна быть на уровне модуля
+    и не должна бросать HTTPException (его нельзя передать из процесса).
+    """
+    image_array = np.frombuffer(content, dtype=np.uint8)
+    image = cv2.imdecode(image_array, cv2.IMREAD_COLOR)
+
+    if image is None:
+        raise InvalidImageError("Неверный формат изображения")
+
+    image = fit_image(image, max_width, max_height)
+    success, buffer = cv2.imencode(f".{format}", image)
+    if not success:
+        raise ValueError("Ошибка при кодировании изображения")
+
+    return buffer.tobytes()
+
+
+def encode_thumbnails(content: bytes, widths: List[int], quality: int = 75) -> List[bytes]:
+    """Сделать уменьшенные копии изображения для каждой ширины из widths.
+
+    JPEG декодируется сразу в уменьшенном масштабе (IMREAD_REDUCED_*), если этого
+    достаточно для самой большой миниатюры.
+    """
+    flag = reduced_flag(jpeg_size(content), max(widths))
+    image = cv2.imdecode(np.frombuffer(content, dtype=np.uint8), flag)
+    if image is None:
+        raise InvalidImageError("Неверный формат изображения")
+
+    return thumbnails_of(image, widths, quality)
+
+
+def thumbnails_of(image: np.ndarray, widths: List[int], quality: int = 75) -> List[bytes]:
+    """Миниатюры уже декодированного изображения для каждой ширины из widths."""
+    thumbnails = []
+    for width in widths:
+        height, current_width = image.shape[:2]
+        thumbnail = image
+        if current_width > width:
+            thumbnail_height = max(1, round(height * width / current_width))
+            thumbnail = cv2.resize(image, (width, thumbnail_height), interpolation=cv2.INTER_AREA)
+
+        success, buffer = cv2.imencode(".jpg", thumbnail, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not success:
+            raise ValueError("Ошибка при кодировании миниатюры")
+        thumbnails.append(buffer.tobytes())
+
+    return thumbnails
+
+
+def prepare_image_file(
+        path: str,
+        out_path: str,
+        format: str,
+        passthrough: bool,
+        max_width: int,
+        max_height: int,
+        widths: List[int],
+        quality: int,
+) -> Tuple[bool, Optional[List[bytes]]]:
+    """Подготовить большое изображение из файла: то же, что prepare и thumbnails.
+
+    Файл целиком в память не читается: проверка для passthrough смотрит только
+    заголовок JPEG, декодирует cv2.imread прямо из файла, а JPEG, который всё
+    равно будет уменьшен, декодируется сразу в уменьшенном масштабе. В памяти
+    воркера остаются только пиксели (не больше нужного размера) и результат.
+    Перекодированное изображение записывается в out_path. Возвращает
+    (перекодировано ли, миниатюры или None, если их не удалось сделать).
+    """
+    size = jpeg_file_size(path)
+    encoded = not (passthrough and fits(size, format, max_width, max_height))
+
+    image = None
+    if encoded:
+        flag = cv2.IMREAD_COLOR
+        if size is not None and max_width and max_height:
+            scale = min(1.0, max_width / size[0], max_height / size[1])
+            flag = reduced_flag(size, int(size[0] * scale), int(size[1] * scale))
+        image = cv2.imread(path, flag)
+        if image is None:
+            raise InvalidImageError("Неверный формат изображения")
+
+        image = fit_image(image, max_width, max_height)
+        success, buffer = cv2.imencode(f".{format}", image)
+        if not success:
+            raise ValueError("Ошибка при кодировании изображения")
+        buffer.tofile(out_path)
+
+    thumbnails = None
+    if widths:
+        if image is None:
+            image = cv2.imread(path, reduced_flag(size, max(widths)))
+        if image is None:
+            logger.error(f"Не удалось создать миниатюры для {path}: неверный формат изображения")
+        else:
+            try:
+                thumbnails = thumbnails_of(image, widths, quality)
+            except ValueError as e:
+                logger.error(f"Не удалось создать миниатюры для {path}: {e}")
+
+    return encoded, thumbnails
+
+
+class ImageProcessor:
+    """Ограниченный пул для обработки изображений вне event loop."""
+
+    def __init__(
+            self,
+            kind: str = "thread",
+            workers: int = 1,
+            queue_depth: int = 0,
+            passthrough: bool = True,
+            max_width: int = 0,
+            max_height: int = 0,
+    ):
+        self.kind = kind
+        self.workers = workers
+        self.queue_depth = queue_depth
+        self.passthrough = passthrough
+        self.max_width = max_width
+        self.max_height = max_height
+        self._executor: Optional[Executor] = None
+        self._pending = 0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            executor_class = ProcessPoolExecutor if self.kind == "process" else ThreadPoolExecutor
+            self._executor = executor_class(max_workers=self.workers)
+            logger.info(f"Пул обработки изображений запущен: {self.kind}, воркеров {self.workers}")
+        return self._executor
+
+    async def run(self, func, *args):
+        if self._pending >= self.workers + self.queue_depth:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Очередь обработки изображений переполнена",
+                headers={"Retry-After": "1"},
+            )
+
+        self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), partial(func, *args))
+        finally:
+            self._pending -= 1
+
+    async def prepare(self, content: bytes, format: str = "jpg") -> bytes:
+        """Подготовить изображение к загрузке.
+
+        Готовый JPEG допустимого размера возвращается без изменений, перекодирование
+        выполняется только для других форматов и слишком больших изображений.
+        """
+        if self.passthrough and can_passthrough(content, format, self.max_width, self.max_height):
+            return content
+
+        try:
+            return await self.run(encode_image, content, format, self.max_width, self.max_height)
+        except InvalidImageError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def thumbnails(self, content: bytes, widths: List[int], quality: int = 75) -> List[bytes]:
+        try:
+            return await self.run(encode_thumbnails, content, widths, quality)
+        except InvalidImageError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    async def prepare_file(
+            self, path: str, out_path: str, format: str, widths: List[int], quality: int = 75
+    ) -> Tuple[bool, Optional[List[bytes]]]:
+        """prepare_image_file в пуле; неверное изображение — 400, как в prepare."""
+        try:
+            return await self.run(
+                prepare_image_file, path, out_path, format, self.passthrough, self.max_width, self.max_height,
+                widths, quality,
+            )
+        except InvalidImageError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+image_processor = ImageProcessor(
+    kind=IMAGE_EXECUTOR,
+    workers=IMAGE_WORKERS,
+    queue_depth=IMAGE_QUEUE_DEPTH,
+    passthrough=IMAGE_PASSTHROUGH,
+    max_width=IMAGE_MAX_WIDTH,
+    max_height=IMAGE_MAX_HEIGHT,
+)
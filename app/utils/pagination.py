@@ -0,0 +1,136 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import func, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import APPROXIMATE_COUNT, APPROXIMATE_COUNT_THRESHOLD
+
+NEXT = "next"
+PREV = "prev"
+
+
+def encode_cursor(row, direction: str) -> str:
+    """Непрозрачный курсор на строку (observed_at, id)."""
+    payload = {"t": row.observed_at.isoformat(), "id": row.id, "d": direction}
+    return base64.urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    """Вернуть (observed_at, id, направление) курсора, ValueError если курсор повреждён."""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        observed_at = datetime.fromisoformat(payload["t"])
+        row_id = int(payload["id"])
+        direction = payload["d"]
+    except (TypeError, KeyError, ValueError) as e:
+        raise ValueError("Неверный курсор") from e
+
+    if direction not in (NEXT, PREV) or observed_at.tzinfo is None:
+        raise ValueError("Неверный курсор")
+
+    return observed_at, row_id, direction
+
+
+async def paginate(
+        db: AsyncSession,
+        query,
+        model,
+        page: Optional[int] = 1,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+):
+    """Страница query по убыванию (observed_at, id) и курсоры соседних страниц.
+
+    С курсором страница выбирается по ключу (keyset) и стоит одинаково на любой
+    глубине, без курсора используется старый OFFSET по page. Возвращает
+    (строки, next_cursor, prev_cursor), курсор равен None, если страницы нет.
+    """
+    key = tuple_(model.observed_at, model.id)
+
+    if cursor:
+        observed_at, row_id, direction = decode_cursor(cursor)
+        if direction == NEXT:
+            query = query.filter(key < tuple_(observed_at, row_id)).order_by(model.observed_at.desc(), model.id.desc())
+        else:
+            query = query.filter(key > tuple_(observed_at, row_id)).order_by(model.observed_at.asc(), model.id.asc())
+        has_before = True
+    else:
+        direction = NEXT
+        offset = (page - 1) * limit if page and page > 1 else 0
+        query = query.order_by(model.observed_at.desc(), model.id.desc()).offset(offset)
+        has_before = offset > 0
+
+    # Одна лишняя строка показывает, есть ли следующая страница
+    result = await db.execute(query.limit(limit + 1))
+    rows = result.scalars().all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    if direction == PREV:
+        rows = list(reversed(rows))
+        has_more, has_before = has_before, has_more
+
+    if not rows:
+        return rows, None, None
+
+    next_cursor = encode_cursor(rows[-1], NEXT) if has_more else None
+    prev_cursor = encode_cursor(rows[0], PREV) if has_before else None
+
+    return rows, next_cursor, prev_cursor
+
+
+async def estimate_rows(db: AsyncSession, query) -> int:
+    """Оценка числа строк query по плану (EXPLAIN), без выполнения запроса."""
+    connection = await db.connection()
+    compiled = query.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup)
+    result = await connection.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", params)
+    plan = result.scalar_one()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_rows(
+        db: AsyncSession,
+        query,
+        approximate: bool = APPROXIMATE_COUNT,
+        threshold: int = APPROXIMATE_COUNT_THRESHOLD,
+):
+    """SELECT count(*) по query.
+
+    В режиме approximate сначала берётся оценка планировщика, и если она не
+    меньше threshold, возвращается она вместо точного подсчёта. Возвращает
+    (число, приблизительное ли оно).
+    """
+    query = query.order_by(None)
+
+    if approximate:
+        estimate = await estimate_rows(db, query)
+        if estimate >= threshold:
+            return estimate, True
+
+    result = await db.execute(query.with_only_columns(func.count(), maintain_column_froms=True))
+    return result.scalar_one(), False
+
+
+async def page_and_count(
+        db: AsyncSession,
+        query,
+        model,
+        page: Optional[int] = 1,
+        limit: int = 10,
+        cursor: Optional[str] = None,
+):
+    """Страница (paginate) и count_rows по одному query.
+
+    Оба запроса идут по сессии запроса друг за другом: отдельная сессия на
+    подсчёт удваивала бы число соединений на запрос и под нагрузкой исчерпывала
+    пул. Возвращает ((строки, next_cursor, prev_cursor), (число, приблизительное
+    ли оно)).
+    """
+    page_result = await paginate(db, query, model, page=page, limit=limit, cursor=cursor)
+    return page_result, await count_rows(db, query)
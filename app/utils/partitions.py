@@ -0,0 +1,53 @@
+import re
+from datetime import datetime
+from typing import Optional
+
+from app.config import current_tz
+
+PARTITIONED_TABLES = ('car', 'unknown_car')
+
+
+def month_start(moment: datetime) -> datetime:
+    """Начало месяца moment в current_tz."""
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(current_tz)
+    return current_tz.localize(datetime(moment.year, moment.month, 1))
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    index = month.year * 12 + month.month - 1 + months
+    return current_tz.localize(datetime(index // 12, index % 12 + 1, 1))
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def parse_partition_name(table: str, name: str) -> Optional[datetime]:
+    """Месяц партиции по её имени, None для других таблиц (например, DEFAULT)."""
+    match = re.fullmatch(rf"{re.escape(table)}_y(\d{{4}})m(\d{{2}})", name)
+    if not match:
+        return None
+    return current_tz.localize(datetime(int(match.group(1)), int(match.group(2)), 1))
+
+
+def create_partition_sql(table: str, month: datetime, parent: Optional[str] = None) -> str:
+    """CREATE TABLE для месячной партиции [month, month + 1).
+
+    parent задаётся, когда партиции создаются у таблицы, которая ещё будет
+    переименована в table (см. миграцию секционирования).
+    """
+    start = month_start(month)
+    end = add_months(start, 1)
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table, start)} PARTITION OF {parent or table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    )
+
+
+def default_partition_name(table: str) -> str:
+    return f"{table}_default"
+
+
+def create_default_partition_sql(table: str, parent: Optional[str] = None) -> str:
+    return f"CREATE TABLE IF NOT EXISTS {default_partition_name(table)} PARTITION OF {parent or table} DEFAULT"
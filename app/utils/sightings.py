@@ -0,0 +1,89 @@
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Optional, List, Tuple
+
+from app.config import SIGHTING_DEBOUNCE_SECONDS, SIGHTING_MAX_PLATES
+
+
+class SightingIndex:
+    """Недавние проезды по номеру машины с вытеснением по TTL.
+
+    Повторное чтение того же номера в пределах окна не создаёт новую запись,
+    а сливается с последней записью этого номера. Окно скользящее: каждое
+    слитое чтение продлевает его.
+    """
+
+    def __init__(self, window_seconds: int = 0, max_plates: int = 100000):
+        self.window = timedelta(seconds=window_seconds)
+        self.max_plates = max_plates
+        self.collapsed = 0
+        self._sightings = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > timedelta(0)
+
+    def _in_window(self, last_seen: datetime, observed_at: datetime) -> bool:
+        return timedelta(0) <= observed_at - last_seen <= self.window
+
+    def _evict(self, observed_at: datetime):
+        while self._sightings:
+            last_seen, _ = next(iter(self._sightings.values()))
+            if observed_at - last_seen <= self.window and len(self._sightings) <= self.max_plates:
+                break
+            self._sightings.popitem(last=False)
+
+    def lookup(self, number: str, observed_at: Optional[datetime]) -> Optional[int]:
+        """Вернуть id записи, с которой нужно слить это чтение, или None."""
+        if not self.enabled or observed_at is None:
+            return None
+
+        self._evict(observed_at)
+        sighting = self._sightings.get(number)
+        if sighting is None or not self._in_window(sighting[0], observed_at):
+            return None
+        return sighting[1]
+
+    def record(self, number: str, observed_at: Optional[datetime], car_id: int, collapsed: bool = False):
+        if not self.enabled or observed_at is None:
+            return
+
+        self._sightings[number] = (observed_at, car_id)
+        self._sightings.move_to_end(number)
+        if collapsed:
+            self.collapsed += 1
+
+    def plan(self, sightings: List[Tuple[str, Optional[datetime]]]) -> list:
+        """Разобрать пачку чтений по порядку.
+
+        Для каждого чтения возвращает None (новая запись), ("car", id) (слить с
+        существующей записью) или ("item", i) (слить с i-м чтением этой же пачки).
+        """
+        plan = []
+        leaders = {}
+        for index, (number, observed_at) in enumerate(sightings):
+            leader = leaders.get(number)
+            car_id = self.lookup(number, observed_at)
+
+            if leader is not None and observed_at is not None and self._in_window(leader[0], observed_at):
+                target = leader[1]
+            elif car_id is not None:
+                target = ("car", car_id)
+            else:
+                target = None
+
+            plan.append(target)
+            if observed_at is not None:
+                leaders[number] = (observed_at, target or ("item", index))
+
+        return plan
+
+    def stats(self) -> dict:
+        return {
+            "window_seconds": int(self.window.total_seconds()),
+            "tracked_plates": len(self._sightings),
+            "collapsed_reads": self.collapsed,
+        }
+
+
+sighting_index = SightingIndex(window_seconds=SIGHTING_DEBOUNCE_SECONDS, max_plates=SIGHTING_MAX_PLATES)
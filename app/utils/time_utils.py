@@ -1,7 +1,41 @@
-def round_time_slot(time):
-    if time.minute >= 30:
-        rounded_hour = (time.hour + 1) % 24
-    else:
-        rounded_hour = time.hour
+from datetime import datetime, timedelta
 
-    return f"{rounded_hour:02}:00"
+from app.config import current_tz
+
+
+def parse_observed_at(date, time):
+    try:
+        return current_tz.localize(datetime.strptime(f"{date} {time}", "%Y-%m-%d %H:%M:%S"))
+    except (TypeError, ValueError):
+        return None
+
+
+def day_range(day: str):
+    start = datetime.strptime(day, "%Y-%m-%d")
+    return current_tz.localize(start), current_tz.localize(start + timedelta(days=1))
+
+
+def month_range(month: str):
+    start = datetime.strptime(month, "%Y-%m")
+    end = start.replace(year=start.year + 1, month=1) if start.month == 12 else start.replace(month=start.month + 1)
+    return current_tz.localize(start), current_tz.localize(end)
+
+
+def week_range(week: str):
+    year, week_num = week.split('-')
+    start = datetime.strptime(f'{year}-W{week_num}-1', "%Y-W%W-%w")
+    return current_tz.localize(start), current_tz.localize(start + timedelta(days=7))
+
+
+def date_range(date: str):
+    """Observed-at range [start, end) for a day (YYYY-MM-DD) or a month (YYYY-MM)."""
+    if len(date) == 10:
+        return day_range(date)
+    if len(date) == 7:
+        return month_range(date)
+    raise ValueError(f"Invalid date {date}")
+
+
+def hour_bucket(observed_at: datetime) -> datetime:
+    """Start of the hour of observed_at in current_tz."""
+    return observed_at.astimezone(current_tz).replace(minute=0, second=0, microsecond=0)
@@ -0,0 +1,28 @@
+"""add thumbnail_url to car and unknown_car
+
+Revision ID: 3a7c9e1d5b20
+Revises: 8f34f1e18526
+Create Date: 2026-10-18 10:12:31.402117
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3a7c9e1d5b20'
+down_revision: Union[str, None] = '8f34f1e18526'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('car', sa.Column('thumbnail_url', sa.VARCHAR(), nullable=True))
+    op.add_column('unknown_car', sa.Column('thumbnail_url', sa.VARCHAR(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('unknown_car', 'thumbnail_url')
+    op.drop_column('car', 'thumbnail_url')
@@ -0,0 +1,73 @@
+"""add observed_at to car and unknown_car
+
+Revision ID: 9d41b7e2c6a8
+Revises: 3a7c9e1d5b20
+Create Date: 2026-10-18 13:40:05.718264
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.config import current_tz
+
+# revision identifiers, used by Alembic.
+revision: str = '9d41b7e2c6a8'
+down_revision: Union[str, None] = '3a7c9e1d5b20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 10000
+TABLES = ('car', 'unknown_car')
+
+SAFE_OBSERVED_AT = """
+CREATE FUNCTION pg_temp.safe_observed_at(date text, time text, tz text) RETURNS timestamptz AS $$
+BEGIN
+    IF date !~ '^[0-9]{4}-[0-9]{2}-[0-9]{2}$' OR time !~ '^[0-9]{2}:[0-9]{2}:[0-9]{2}$' THEN
+        RETURN NULL;
+    END IF;
+    RETURN (date || ' ' || time)::timestamp AT TIME ZONE tz;
+EXCEPTION
+    WHEN invalid_datetime_format OR datetime_field_overflow THEN
+        RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('observed_at', postgresql.TIMESTAMP(timezone=True), nullable=True))
+
+    # Backfill in batches, each batch is committed on its own so the table is not locked for the whole run
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        # Strings that look like a date/time but are not one (2024-13-45, 25:61:00) stay NULL
+        # instead of aborting the migration on the cast
+        connection.execute(sa.text(SAFE_OBSERVED_AT))
+        for table in TABLES:
+            first_id, last_id = connection.execute(sa.text(f"SELECT min(id), max(id) FROM {table}")).one()
+            if first_id is None:
+                continue
+
+            # Walk id ranges, rows that stay NULL must not be picked up again
+            for start in range(first_id, last_id + 1, BACKFILL_BATCH_SIZE):
+                connection.execute(
+                    sa.text(
+                        f"UPDATE {table} SET observed_at = pg_temp.safe_observed_at(date, time, :tz) "
+                        f"WHERE id >= :start AND id < :end AND observed_at IS NULL"
+                    ),
+                    {"tz": current_tz.zone, "start": start, "end": start + BACKFILL_BATCH_SIZE},
+                )
+        connection.execute(sa.text("DROP FUNCTION pg_temp.safe_observed_at(text, text, text)"))
+
+    for table in TABLES:
+        op.create_index(f'ix_{table}_observed_at', table, ['observed_at'], unique=False, postgresql_include=['number'])
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.drop_index(f'ix_{table}_observed_at', table_name=table)
+        op.drop_column(table, 'observed_at')
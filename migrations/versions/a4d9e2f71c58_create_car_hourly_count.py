@@ -0,0 +1,46 @@
+"""create car_hourly_count
+
+Revision ID: a4d9e2f71c58
+Revises: f3c81d2b6e94
+Create Date: 2026-10-18 18:12:26.730519
+
+Rollup of car attendances per (hour, plate) feeding the dashboard graphics.
+The table is filled from the existing cars; it can be rebuilt later with
+`python -m app.scripts.rebuild_hourly_counts`.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+from app.config import current_tz
+
+# revision identifiers, used by Alembic.
+revision: str = 'a4d9e2f71c58'
+down_revision: Union[str, None] = 'f3c81d2b6e94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'car_hourly_count',
+        sa.Column('hour', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('number', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('hour', 'number'),
+    )
+
+    op.execute(
+        sa.text(
+            "INSERT INTO car_hourly_count (hour, number, count) "
+            "SELECT date_trunc('hour', observed_at AT TIME ZONE :tz) AT TIME ZONE :tz AS hour, number, count(*) "
+            "FROM car GROUP BY 1, number"
+        ).bindparams(tz=current_tz.zone)
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('car_hourly_count')
@@ -0,0 +1,58 @@
+"""add trigram index on car number
+
+Revision ID: b7f0c3e85a21
+Revises: a4d9e2f71c58
+Create Date: 2026-10-18 18:47:53.261904
+
+Serves partial plate search (ILIKE '%...%') in /exception-nums/search.
+Requires the pg_trgm extension, which is created if missing.
+
+car is partitioned, and CREATE INDEX CONCURRENTLY cannot run on a partitioned
+table. The index is created ON ONLY car (invalid, no build), then built
+CONCURRENTLY on every partition and attached; it becomes valid once all
+partitions are attached, and partitions created later get it automatically.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b7f0c3e85a21'
+down_revision: Union[str, None] = 'a4d9e2f71c58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEX = 'ix_car_number_trgm'
+TABLE = 'car'
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        connection = op.get_bind()
+        connection.execute(sa.text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        connection.execute(sa.text(
+            f"CREATE INDEX IF NOT EXISTS {INDEX} ON ONLY {TABLE} USING gin (number gin_trgm_ops)"
+        ))
+
+        partitions = connection.execute(
+            sa.text("SELECT child.relname FROM pg_inherits "
+                    "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+                    "WHERE pg_inherits.inhparent = to_regclass(:table)"),
+            {"table": TABLE},
+        ).scalars().all()
+        for partition in partitions:
+            partition_index = f"{partition}_number_trgm_idx"
+            connection.execute(sa.text(
+                f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition_index} "
+                f"ON {partition} USING gin (number gin_trgm_ops)"
+            ))
+            connection.execute(sa.text(f"ALTER INDEX {INDEX} ATTACH PARTITION {partition_index}"))
+
+
+def downgrade() -> None:
+    # Dropping the parent index drops the attached partition indexes with it
+    op.drop_index(INDEX, table_name=TABLE)
@@ -0,0 +1,43 @@
+"""add composite indexes for hot queries
+
+Revision ID: c52e8f0a7d13
+Revises: 9d41b7e2c6a8
+Create Date: 2026-10-18 15:02:47.331906
+
+Indexes are built with CREATE INDEX CONCURRENTLY, so the revision can run on a
+live table. Use `python -m app.scripts.explain_queries --label before|after` to
+record EXPLAIN ANALYZE output around it.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c52e8f0a7d13'
+down_revision: Union[str, None] = '9d41b7e2c6a8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = (
+    # get_cars_by_day / get_cars_by_week / get_cars_by_month page: range on observed_at, newest first
+    ('ix_car_observed_at_id', 'car', [sa.text('observed_at DESC'), sa.text('id DESC')]),
+    # get_car: one plate within a day or a month, newest first
+    ('ix_car_number_observed_at', 'car', ['number', sa.text('observed_at DESC')]),
+    # get_unknown_cars page: range on observed_at, newest first
+    ('ix_unknown_car_observed_at_id', 'unknown_car', [sa.text('observed_at DESC'), sa.text('id DESC')]),
+)
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False, postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in INDEXES:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,56 @@
+"""create car_daily_presence
+
+Revision ID: c9e25a7f3d16
+Revises: b7f0c3e85a21
+Create Date: 2026-10-18 19:26:08.447195
+
+First and last attendance and the attendance count of every plate per day.
+The table is filled from the existing cars; it can be rebuilt later with
+`python -m app.scripts.rebuild_daily_presence`.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision: str = 'c9e25a7f3d16'
+down_revision: Union[str, None] = 'b7f0c3e85a21'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'car_daily_presence',
+        sa.Column('number', sa.String(), nullable=False),
+        sa.Column('date', sa.String(), nullable=False),
+        sa.Column('first_seen', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('last_seen', postgresql.TIMESTAMP(timezone=True), nullable=False),
+        sa.Column('first_image', sa.String(), nullable=True),
+        sa.Column('last_image', sa.String(), nullable=True),
+        sa.Column('first_thumbnail', sa.String(), nullable=True),
+        sa.Column('last_thumbnail', sa.String(), nullable=True),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('number', 'date'),
+    )
+    op.create_index('ix_car_daily_presence_date', 'car_daily_presence', ['date'], unique=False)
+
+    op.execute(
+        "INSERT INTO car_daily_presence "
+        "(number, date, first_seen, last_seen, first_image, last_image, first_thumbnail, last_thumbnail, count) "
+        "SELECT number, date, min(observed_at), max(observed_at), "
+        "(array_agg(image_url ORDER BY observed_at, id))[1], "
+        "(array_agg(image_url ORDER BY observed_at DESC, id DESC))[1], "
+        "(array_agg(thumbnail_url ORDER BY observed_at, id))[1], "
+        "(array_agg(thumbnail_url ORDER BY observed_at DESC, id DESC))[1], "
+        "count(*) "
+        "FROM car GROUP BY number, date"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_car_daily_presence_date', table_name='car_daily_presence')
+    op.drop_table('car_daily_presence')
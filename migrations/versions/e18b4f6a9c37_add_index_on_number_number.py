@@ -0,0 +1,31 @@
+"""add index on number.number
+
+Revision ID: e18b4f6a9c37
+Revises: c52e8f0a7d13
+Create Date: 2026-10-18 16:21:09.514872
+
+Serves the NOT EXISTS anti-join that excludes exception numbers from the
+dashboard and daily report queries.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e18b4f6a9c37'
+down_revision: Union[str, None] = 'c52e8f0a7d13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index('ix_number_number', 'number', ['number'], unique=False,
+                        postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_number_number', table_name='number', postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,100 @@
+"""partition car and unknown_car by month
+
+Revision ID: f3c81d2b6e94
+Revises: e18b4f6a9c37
+Create Date: 2026-10-18 17:05:42.108337
+
+Rebuilds car and unknown_car as tables partitioned by RANGE (observed_at), one
+partition per month in current_tz plus a DEFAULT partition. Existing rows are
+copied into the new table, so the revision holds an exclusive lock on both
+tables for the duration of the copy; run it in a maintenance window.
+
+The partition key has to be part of the primary key, which becomes
+(id, observed_at). id stays unique through the existing sequence. Rows
+without observed_at get their created_at. Upcoming partitions are created by
+app.crud.partitions.maintain_partitions.
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.config import PARTITION_MONTHS_AHEAD
+from app.utils.partitions import (
+    PARTITIONED_TABLES,
+    month_start,
+    add_months,
+    create_partition_sql,
+    create_default_partition_sql,
+)
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3c81d2b6e94'
+down_revision: Union[str, None] = 'e18b4f6a9c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = {
+    'car': (
+        ('ix_car_id', ['id'], {}),
+        ('ix_car_observed_at', ['observed_at'], {'postgresql_include': ['number']}),
+        ('ix_car_observed_at_id', [sa.text('observed_at DESC'), sa.text('id DESC')], {}),
+        ('ix_car_number_observed_at', ['number', sa.text('observed_at DESC')], {}),
+    ),
+    'unknown_car': (
+        ('ix_unknown_car_id', ['id'], {}),
+        ('ix_unknown_car_observed_at', ['observed_at'], {'postgresql_include': ['number']}),
+        ('ix_unknown_car_observed_at_id', [sa.text('observed_at DESC'), sa.text('id DESC')], {}),
+    ),
+}
+
+
+def _rebuild(table: str, new_table: str) -> None:
+    """Copy table into new_table (already created), then swap the names."""
+    connection = op.get_bind()
+    sequence = connection.execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+
+    op.execute(f"INSERT INTO {new_table} SELECT * FROM {table}")
+    if sequence:
+        op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {new_table}.id")
+    op.execute(f"DROP TABLE {table}")
+    op.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+    op.execute(f"ALTER TABLE {table} RENAME CONSTRAINT {new_table}_pkey TO {table}_pkey")
+
+    for name, columns, kwargs in INDEXES[table]:
+        op.create_index(name, table, columns, unique=False, **kwargs)
+
+
+def upgrade() -> None:
+    connection = op.get_bind()
+    last_month = add_months(month_start(datetime.now().astimezone()), PARTITION_MONTHS_AHEAD)
+
+    for table in PARTITIONED_TABLES:
+        new_table = f"{table}_partitioned"
+        op.execute(f"UPDATE {table} SET observed_at = COALESCE(created_at, now()) WHERE observed_at IS NULL")
+
+        op.execute(f"CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS) PARTITION BY RANGE (observed_at)")
+        op.execute(f"ALTER TABLE {new_table} ALTER COLUMN observed_at SET NOT NULL")
+        op.execute(f"ALTER TABLE {new_table} ADD CONSTRAINT {new_table}_pkey PRIMARY KEY (id, observed_at)")
+
+        first_observed_at = connection.execute(sa.text(f"SELECT min(observed_at) FROM {table}")).scalar()
+        month = month_start(first_observed_at) if first_observed_at else add_months(last_month, -PARTITION_MONTHS_AHEAD)
+        while month <= last_month:
+            op.execute(create_partition_sql(table, month, parent=new_table))
+            month = add_months(month, 1)
+        op.execute(create_default_partition_sql(table, parent=new_table))
+
+        _rebuild(table, new_table)
+
+
+def downgrade() -> None:
+    for table in PARTITIONED_TABLES:
+        new_table = f"{table}_plain"
+        op.execute(f"CREATE TABLE {new_table} (LIKE {table} INCLUDING DEFAULTS)")
+        op.execute(f"ALTER TABLE {new_table} ALTER COLUMN observed_at DROP NOT NULL")
+        op.execute(f"ALTER TABLE {new_table} ADD CONSTRAINT {new_table}_pkey PRIMARY KEY (id)")
+
+        # Dropping the partitioned table drops its partitions, detached ones are left alone
+        _rebuild(table, new_table)
@@ -0,0 +1,10 @@
+import os
+
+# app.config reads these at import time, the tests never connect to them
+os.environ.setdefault("DB_USER", "test")
+os.environ.setdefault("DB_PASS", "test")
+os.environ.setdefault("DB_HOST", "localhost")
+os.environ.setdefault("DB_PORT", "5432")
+os.environ.setdefault("DB_NAME", "test")
+os.environ.setdefault("AWS_ENDPOINT_URL", "https://s3.test")
+os.environ.setdefault("AWS_BUCKET_NAME", "bucket")
@@ -0,0 +1,168 @@
+import asyncio
+import io
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException, UploadFile
+
+from app.config import current_tz
+from app.crud import car as car_crud
+from app.crud import unknown_car as unknown_car_crud
+from app.models.car import Car
+from app.utils.sightings import SightingIndex
+
+
+class Result:
+    def __init__(self, values):
+        self.values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.values
+
+
+class FakeSession:
+    """Just enough of AsyncSession for create_cars, with cars kept in memory."""
+
+    def __init__(self, cars=()):
+        self.cars = {car.id: car for car in cars}
+        self.next_id = max(self.cars, default=0) + 1
+        self.committed = False
+
+    async def scalars(self, stmt, rows):
+        inserted = []
+        for row in rows:
+            car = Car(id=self.next_id, **row)
+            self.cars[car.id] = car
+            self.next_id += 1
+            inserted.append(car)
+        return Result(inserted)
+
+    async def execute(self, stmt, params=None):
+        if params is not None:
+            for values in params:
+                for name, value in values.items():
+                    setattr(self.cars[values["id"]], name, value)
+            return Result([])
+        # select(Car).where(Car.id.in_(ids))
+        ids = stmt.whereclause.right.value
+        return Result([self.cars[car_id] for car_id in ids if car_id in self.cars])
+
+    async def commit(self):
+        self.committed = True
+
+    async def rollback(self):
+        pass
+
+
+async def noop(*args, **kwargs):
+    pass
+
+
+def observed(time: str) -> datetime:
+    return current_tz.localize(datetime.strptime(f"2024-01-01 {time}", "%Y-%m-%d %H:%M:%S"))
+
+
+def item(index: int, number: str, time: str) -> dict:
+    return {"index": index, "number": number, "date": "2024-01-01", "time": time,
+            "filename": f"car_{index}.jpg", "content": b"jpeg"}
+
+
+@pytest.fixture
+def sightings(monkeypatch):
+    index = SightingIndex(window_seconds=60)
+    monkeypatch.setattr(car_crud, "sighting_index", index)
+    monkeypatch.setattr(car_crud, "add_hourly_counts", noop)
+    monkeypatch.setattr(car_crud, "add_daily_presence", noop)
+    monkeypatch.setattr(car_crud, "refresh_presence_images", noop)
+    return index
+
+
+def test_sighting_evicted_during_upload_keeps_the_plan(monkeypatch, sightings):
+    """A sighting evicted while the batch uploads must not turn the planned collapse into a new car without image."""
+    monkeypatch.setattr(car_crud, "SIGHTING_UPDATE_IMAGE", False)
+    stored = Car(id=7, number="01A001AA", date="2024-01-01", time="10:00:00",
+                 image_url="https://s3.test/bucket/old.jpg", observed_at=observed("10:00:00"))
+    sightings.record(stored.number, stored.observed_at, stored.id)
+
+    async def upload_images(contents, filenames):
+        # Another request evicts the sighting while this batch awaits its uploads
+        sightings._sightings.clear()
+        return list(filenames)
+
+    monkeypatch.setattr(car_crud.s3_manager, "upload_images", upload_images)
+    db = FakeSession([stored])
+
+    results = asyncio.run(car_crud.create_cars(db, [
+        item(0, "01A001AA", "10:00:30"),
+        item(1, "02B002BB", "10:00:31"),
+    ]))
+
+    by_index = {result["index"]: result for result in results}
+    assert by_index[0]["status"] == "collapsed"
+    assert by_index[0]["car"].id == 7
+    assert by_index[1]["status"] == "created"
+    assert db.committed
+
+
+def test_failed_first_read_is_replaced_by_the_next_read(monkeypatch, sightings):
+    monkeypatch.setattr(car_crud, "SIGHTING_UPDATE_IMAGE", True)
+
+    async def upload_images(contents, filenames):
+        return [HTTPException(status_code=502, detail="Upload failed") if name == "car_0.jpg" else name
+                for name in filenames]
+
+    monkeypatch.setattr(car_crud.s3_manager, "upload_images", upload_images)
+    db = FakeSession()
+
+    results = asyncio.run(car_crud.create_cars(db, [
+        item(0, "01A001AA", "10:00:00"),
+        item(1, "01A001AA", "10:00:10"),
+        item(2, "01A001AA", "10:00:20"),
+    ]))
+
+    by_index = {result["index"]: result for result in results}
+    assert by_index[0]["status"] == "failed"
+    assert by_index[1]["status"] == "created"
+    assert by_index[2]["status"] == "collapsed"
+    assert by_index[2]["car"] is by_index[1]["car"]
+    assert len(db.cars) == 1
+
+
+def test_missing_image_of_a_new_car_fails_only_its_item(monkeypatch, sightings):
+    monkeypatch.setattr(car_crud, "SIGHTING_UPDATE_IMAGE", False)
+
+    async def upload_images(contents, filenames):
+        return [HTTPException(status_code=502, detail="Upload failed") if name == "car_0.jpg" else name
+                for name in filenames]
+
+    monkeypatch.setattr(car_crud.s3_manager, "upload_images", upload_images)
+    db = FakeSession()
+
+    results = asyncio.run(car_crud.create_cars(db, [
+        item(0, "01A001AA", "10:00:00"),
+        item(1, "01A001AA", "10:00:10"),
+        item(2, "02B002BB", "10:00:20"),
+    ]))
+
+    by_index = {result["index"]: result for result in results}
+    assert by_index[0]["status"] == "failed"
+    # Planned as a repeat of item 0, so it was not uploaded and has no image of its own
+    assert by_index[1]["status"] == "failed"
+    assert by_index[2]["status"] == "created"
+
+
+@pytest.mark.parametrize("status_code", [400, 413, 503])
+def test_upload_errors_keep_their_status_code(monkeypatch, sightings, status_code):
+    async def upload_image(image, key):
+        raise HTTPException(status_code=status_code, detail="Rejected")
+
+    monkeypatch.setattr(car_crud.s3_manager, "upload_image", upload_image)
+    image = UploadFile(io.BytesIO(b"jpeg"), filename="car.jpg")
+
+    for create in (car_crud.create_car, unknown_car_crud.create_unknown_car):
+        with pytest.raises(HTTPException) as error:
+            asyncio.run(create(FakeSession(), number="01A001AA", date="2024-01-01", time="10:00:00", image=image))
+        assert error.value.status_code == status_code
@@ -0,0 +1,112 @@
+import asyncio
+
+from app.crud.ingestion import IngestionQueue
+
+
+def make_queue(**kwargs) -> IngestionQueue:
+    options = {"maxsize": 10, "batch_size": 10, "flush_interval": 0.01, "workers": 2, "retry_delay": 0.01}
+    options.update(kwargs)
+    return IngestionQueue(**options)
+
+
+async def enqueue(queue: IngestionQueue, number: str) -> str:
+    result = await queue.enqueue(kind="car", number=number, date="2024-01-01", time="10:00:00",
+                                 filename=f"{number}.jpg", content=b"jpeg")
+    return result["id"]
+
+
+def test_stop_waits_for_the_batch_in_flight():
+    async def main():
+        queue = make_queue()
+        flushed = []
+
+        async def flush_cars(events):
+            await asyncio.sleep(0.05)
+            for event in events:
+                flushed.append(event["id"])
+                queue._done(event)
+            return []
+
+        queue._flush_cars = flush_cars
+        await queue.start()
+        event_id = await enqueue(queue, "01A001AA")
+        # Taken off the queue by a worker, its flush is in flight
+        await asyncio.sleep(0.02)
+        await queue.stop()
+        return event_id, flushed
+
+    event_id, flushed = asyncio.run(main())
+    assert flushed == [event_id]
+
+
+def test_failed_flush_is_retried_and_releases_its_capacity():
+    async def main():
+        queue = make_queue(maxsize=1)
+        attempts = []
+
+        async def flush_cars(events):
+            attempts.append([event["id"] for event in events])
+            if len(attempts) == 1:
+                raise RuntimeError("database is down")
+            for event in events:
+                queue._done(event)
+            return []
+
+        queue._flush_cars = flush_cars
+        await queue.start()
+        event_id = await enqueue(queue, "01A001AA")
+        await asyncio.sleep(0.1)
+        # The only slot is free again, so the queue accepts the next event
+        await enqueue(queue, "02B002BB")
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        return event_id, attempts
+
+    event_id, attempts = asyncio.run(main())
+    assert attempts[:2] == [[event_id], [event_id]]
+    assert len(attempts) == 3
+
+
+def test_spool_of_a_live_process_is_not_replayed_by_another(tmp_path):
+    async def main():
+        flushed = {"a": [], "b": [], "c": []}
+
+        def queue_for(name):
+            queue = make_queue(spool_dir=str(tmp_path), workers=1)
+
+            async def flush_cars(events):
+                flushed[name].extend(event["id"] for event in events)
+                if name == "a":
+                    # Process a never gets to flush, like a crash in the middle of the batch
+                    await asyncio.sleep(3600)
+                for event in events:
+                    queue._done(event)
+                return []
+
+            queue._flush_cars = flush_cars
+            return queue
+
+        first = queue_for("a")
+        await first.start()
+        event_id = await enqueue(first, "01A001AA")
+        await asyncio.sleep(0.05)
+
+        second = queue_for("b")
+        await second.start()
+        await asyncio.sleep(0.05)
+
+        # Process a exits without cleaning up, its lock is released by the OS
+        first._spool_lock.close()
+        for task in first._tasks:
+            task.cancel()
+        third = queue_for("c")
+        await third.start()
+        await asyncio.sleep(0.05)
+
+        await second.stop()
+        await third.stop()
+        return event_id, flushed
+
+    event_id, flushed = asyncio.run(main())
+    assert flushed == {"a": [event_id], "b": [], "c": [event_id]}
+    assert [path.name for path in tmp_path.iterdir()] == []
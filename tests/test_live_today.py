@@ -0,0 +1,154 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app.crud.cars import live_today
+from app.crud.cars.aggregator import car_row
+from app.crud.cars.live_today import TodayStore
+from app.models.exception_nums import Number
+
+DAY = "2024-01-01"
+NEXT_DAY = "2024-01-02"
+
+
+def car(car_id: int, number: str, time: str, date: str = DAY):
+    return SimpleNamespace(id=car_id, number=number, date=date, time=time,
+                           image_url=f"https://s3.test/bucket/{car_id}.jpg", thumbnail_url=None)
+
+
+class Result:
+    def __init__(self, values):
+        self.values = values
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.values
+
+    def one(self):
+        return self.values
+
+
+class FakeSession:
+    """Answers the queries of TodayStore from cars and exception numbers kept in memory."""
+
+    def __init__(self, cars=(), numbers=()):
+        self.cars = list(cars)
+        self.numbers = list(numbers)
+        self.number_reads = 0
+
+    async def execute(self, stmt):
+        if stmt.column_descriptions[0]["entity"] is Number:
+            self.number_reads += 1
+            return Result(self.numbers)
+        # select(count(), max(Car.id)) of the day
+        return Result((len(self.cars), max((c.id for c in self.cars), default=None)))
+
+
+@pytest.fixture
+def day(monkeypatch):
+    today = {"day": DAY}
+    monkeypatch.setattr(live_today, "current_day", lambda: today["day"])
+    return today
+
+
+@pytest.fixture
+def reads(monkeypatch):
+    """Replaces the read of the day; hooks run while the read is in flight."""
+    state = {"count": 0, "during": []}
+
+    async def fetch_car_rows(db, filters):
+        state["count"] += 1
+        rows = [car_row(c) for c in db.cars]
+        for hook in state["during"]:
+            hook()
+        await asyncio.sleep(0)
+        return rows
+
+    monkeypatch.setattr(live_today, "fetch_car_rows", fetch_car_rows)
+    return state
+
+
+def loaded_store(db, **kwargs) -> TodayStore:
+    store = TodayStore(enabled=True, **kwargs)
+    store._roll()
+    asyncio.run(store._load(db))
+    return store
+
+
+def test_roll_starts_a_loaded_store_empty_on_the_next_day(day, reads):
+    store = loaded_store(FakeSession([car(1, "01A001AA", "10:00:00"), car(2, "02B002BB", "11:00:00")]))
+    assert len(store.ids) == 2
+
+    day["day"] = NEXT_DAY
+    store.add([car(3, "03C003CC", "00:00:05", date=NEXT_DAY)])
+
+    assert store.day == NEXT_DAY
+    assert store.loaded
+    assert list(store.ids) == [3]
+    assert store.attend_count == {"03C003CC": 1}
+    assert store.last_id == 3
+
+
+def test_roll_keeps_an_unloaded_store_unloaded(day):
+    store = TodayStore(enabled=True)
+    store.add([car(1, "01A001AA", "10:00:00")])
+
+    assert store.day == DAY
+    assert not store.loaded
+    assert len(store.ids) == 0
+
+
+def test_load_applies_cars_committed_during_the_read_once(day, reads):
+    db = FakeSession([car(1, "01A001AA", "10:00:00"), car(2, "01A001AA", "10:05:00")])
+    store = TodayStore(enabled=True)
+    store._roll()
+    # Car 2 is already in the read, car 3 is committed after it
+    reads["during"].append(lambda: store.add([car(2, "01A001AA", "10:05:00"), car(3, "01A001AA", "10:10:00")]))
+
+    asyncio.run(store._load(db))
+
+    assert sorted(store.ids) == [1, 2, 3]
+    assert store.attend_count == {"01A001AA": 3}
+    assert store.latest_rows["01A001AA"][0] == 3
+    assert store._pending is None
+
+
+def test_reconcile_reloads_when_postgres_differs(day, reads):
+    db = FakeSession([car(1, "01A001AA", "10:00:00")])
+    store = loaded_store(db, reconcile_seconds=0)
+    assert reads["count"] == 1
+
+    # Matching count and last id, no reload
+    asyncio.run(store._reconcile(db))
+    assert reads["count"] == 1
+
+    # Written by another worker
+    db.cars.append(car(2, "02B002BB", "10:30:00"))
+    result = asyncio.run(store.aggregate(db))
+
+    assert reads["count"] == 2
+    assert sorted(store.ids) == [1, 2]
+    assert result["general_count"] == 2
+    assert result["total_cars"] == 2
+
+
+def test_exception_numbers_are_read_once_per_reconcile_interval(day, reads, monkeypatch):
+    clock = {"now": 1000.0}
+    monkeypatch.setattr(live_today.time, "monotonic", lambda: clock["now"])
+    db = FakeSession([car(1, "01A001AA", "10:00:00"), car(2, "02B002BB", "10:30:00")])
+    store = loaded_store(db, reconcile_seconds=30)
+
+    assert asyncio.run(store.aggregate(db))["total_cars"] == 2
+    db.numbers.append("01A001AA")
+    clock["now"] += 10
+    assert asyncio.run(store.aggregate(db))["total_cars"] == 2
+    assert db.number_reads == 1
+
+    clock["now"] += 30
+    result = asyncio.run(store.aggregate(db))
+    assert db.number_reads == 2
+    assert result["total_cars"] == 1
+    assert result["general_count"] == 1
@@ -0,0 +1,29 @@
+from app.crud.cars import columnar
+from app.crud.cars.aggregator import AttendanceAggregator
+
+
+def row(row_id: int, number: str, time: str) -> tuple:
+    return row_id, number, "2024-01-01", time, f"https://s3.test/bucket/{row_id}.jpg", None
+
+
+# Same count and same latest time, the plate that sorts lower has the higher id
+ROWS = [
+    row(1, "02B002BB", "09:00:00"),
+    row(2, "02B002BB", "10:00:00"),
+    row(3, "01A001AA", "09:30:00"),
+    row(4, "01A001AA", "10:00:00"),
+    row(5, "03C003CC", "11:00:00"),
+]
+
+
+def test_ties_are_broken_by_latest_time_then_plate_like_postgres():
+    # ORDER BY count DESC, max(observed_at) DESC, number DESC
+    expected = ["02B002BB", "01A001AA", "03C003CC"]
+
+    python_top = AttendanceAggregator().add_all(ROWS).top(size=3)
+    columnar_top, _ = columnar.top_rows(ROWS, size=3)
+
+    assert [car["car_number"] for car in python_top] == expected
+    assert [car["car_number"] for car in columnar_top] == expected
+    # Every plate is still represented by its latest row
+    assert [car["attend_id"] for car in python_top] == [2, 4, 5]